@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.accounts"
+
+    def ready(self):
+        # pylint: disable-next=import-outside-toplevel,unused-import
+        from apps.accounts import signals  # noqa: F401
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.14 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "accounts",
+            "0003_remove_account_acquirer_remove_account_omie_account_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="installment",
+            name="fee",
+            field=models.DecimalField(decimal_places=4, max_digits=7),
+        ),
+    ]
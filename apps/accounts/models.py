@@ -41,7 +41,7 @@ class Installment(models.Model):
         Account, related_name="installments", on_delete=models.CASCADE
     )
     installment_number = models.IntegerField()
-    fee = models.FloatField()
+    fee = models.DecimalField(max_digits=7, decimal_places=4)
 
     def __str__(self):
         return f"Installment {self.installment_number} - Fee {self.fee}%"
@@ -0,0 +1,66 @@
+import threading
+import time
+import uuid
+from decimal import Decimal
+from typing import Optional
+
+from django.conf import settings
+
+from apps.accounts.models import Installment
+
+
+class InstallmentFeeCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.fees: Optional[dict[tuple, Decimal]] = None
+        self.loaded_at = 0.0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_fee(
+        self, account_id: uuid.UUID, installment_number: int
+    ) -> Optional[Decimal]:
+        with self.lock:
+            if self.fees is not None and not self._expired():
+                self.hits += 1
+                return self.fees.get((account_id, installment_number))
+
+            self.misses += 1
+            generation = self.generation
+
+        fees = {
+            (account_id, number): fee
+            for account_id, number, fee in Installment.objects.values_list(
+                "account_id", "installment_number", "fee"
+            )
+        }
+
+        with self.lock:
+            if generation == self.generation:
+                self.fees = fees
+                self.loaded_at = time.monotonic()
+
+        return fees.get((account_id, installment_number))
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.fees = None
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "size": len(self.fees) if self.fees is not None else 0,
+            }
+
+    def _expired(self) -> bool:
+        return time.monotonic() - self.loaded_at > settings.INSTALLMENT_FEE_CACHE_TTL
+
+
+installment_fee_cache = InstallmentFeeCache()
@@ -0,0 +1,24 @@
+from decimal import Decimal
+from typing import Optional
+
+from apps.accounts.models import Account
+from apps.accounts.services.fee_cache import installment_fee_cache
+
+
+class AccountFeeTable:
+    def __init__(self):
+        self.accounts_by_omie_id: dict[int, Account] = {}
+
+        accounts = Account.objects.select_related(
+            "omie_account_origin", "omie_account_destiny"
+        )
+
+        for account in accounts:
+            if account.omie_account_origin:
+                self.accounts_by_omie_id[account.omie_account_origin.omie_id] = account
+
+    def get_account(self, omie_id: int) -> Optional[Account]:
+        return self.accounts_by_omie_id.get(omie_id)
+
+    def get_fee(self, account: Account, installment_number: int) -> Optional[Decimal]:
+        return installment_fee_cache.get_fee(account.id, installment_number)
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.accounts.models import Installment
+from apps.accounts.services.fee_cache import installment_fee_cache
+
+
+@receiver([post_save, post_delete], sender=Installment)
+def invalidate_installment_fee_cache(**kwargs):
+    installment_fee_cache.invalidate()
@@ -1,13 +1,34 @@
 from django.contrib import admin
 
+from utils.money import to_reais
+
 from .models import Transaction
 
 
+class AcquirerFeeFilter(admin.SimpleListFilter):
+    title = "acquirer fee"
+    parameter_name = "acquirer_fee"
+
+    def lookups(self, request, model_admin):
+        fees = (
+            Transaction.objects.exclude(acquirer_fee__isnull=True)
+            .order_by("acquirer_fee")
+            .values_list("acquirer_fee", flat=True)
+            .distinct()
+        )
+        return [(fee, f"R$ {to_reais(fee):.2f}") for fee in fees]
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        return queryset.filter(acquirer_fee=self.value())
+
+
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
     list_display = (
         "cod_id_omie",
-        "acquirer_fee",
+        "acquirer_fee_display",
         "document_type",
         "omie_receipt_releasead",
         "omie_fee_launched",
@@ -19,7 +40,7 @@ class TransactionAdmin(admin.ModelAdmin):
     )
     list_filter = (
         "document_type",
-        "acquirer_fee",
+        AcquirerFeeFilter,
         "status",
         "expected_date",
         "omie_receipt_releasead",
@@ -27,5 +48,49 @@ class TransactionAdmin(admin.ModelAdmin):
         "omie_value_transferred",
     )
     search_fields = ("cod_id_omie", "tid")
-    readonly_fields = ("value_difference", "received_value")
+    # Amounts are stored in cents; they are shown in reais and not edited here
+    exclude = (
+        "expected_value",
+        "fee",
+        "balance",
+        "received_value",
+        "acquirer_fee",
+        "value_difference",
+    )
+    readonly_fields = (
+        "expected_value_display",
+        "fee_display",
+        "balance_display",
+        "received_value_display",
+        "acquirer_fee_display",
+        "value_difference_display",
+    )
     list_per_page = 250
+
+    # Transactions are imported from Omie and their amounts cannot be typed here
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description="expected value", ordering="expected_value")
+    def expected_value_display(self, obj):
+        return to_reais(obj.expected_value)
+
+    @admin.display(description="fee", ordering="fee")
+    def fee_display(self, obj):
+        return to_reais(obj.fee)
+
+    @admin.display(description="balance", ordering="balance")
+    def balance_display(self, obj):
+        return to_reais(obj.balance)
+
+    @admin.display(description="received value", ordering="received_value")
+    def received_value_display(self, obj):
+        return to_reais(obj.received_value)
+
+    @admin.display(description="acquirer fee", ordering="acquirer_fee")
+    def acquirer_fee_display(self, obj):
+        return to_reais(obj.acquirer_fee)
+
+    @admin.display(description="value difference", ordering="value_difference")
+    def value_difference_display(self, obj):
+        return to_reais(obj.value_difference)
@@ -1,37 +1,78 @@
-from ninja import Router
+import uuid
+from typing import Literal, Optional
+
+from ninja import Query, Router
 
 from utils.jwt import JWTAuth, decode_jwt_token
 
-from .schema import TransactionListSchema
-from .services.omie_service import OmieService
-from .services.toskani_service import ToskaniService
+from .models import SyncJob
+from .schema import (
+    LateBillsSchema,
+    SyncJobSchema,
+    TransactionFilterSchema,
+    TransactionListSchema,
+    TransactionSummarySchema,
+)
+from .services.job_service import JobService
 from .services.transactions_service import TransactionService
 
 transaction_router = Router(auth=JWTAuth())
 transaction_service = TransactionService()
-omie_service = OmieService()
-toskani_service = ToskaniService()
+job_service = JobService()
 
 
 @transaction_router.get("", response=TransactionListSchema)
-def list_transactions(request):
+def list_transactions(
+    request,
+    filters: TransactionFilterSchema = Query(...),
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    include_total: bool = False,
+):
+    decode_jwt_token(request.headers.get("Authorization"))
+    return transaction_service.list_transactions(filters, cursor, limit, include_total)
+
+
+@transaction_router.get("/export")
+def export_transactions(
+    request,
+    filters: TransactionFilterSchema = Query(...),
+    file_format: Literal["csv", "ndjson"] = "csv",
+    compress: bool = False,
+):
+    decode_jwt_token(request.headers.get("Authorization"))
+    return transaction_service.export_transactions(filters, file_format, compress)
+
+
+@transaction_router.get("/summary", response=TransactionSummarySchema)
+def summarize_transactions(
+    request,
+    filters: TransactionFilterSchema = Query(...),
+    bucket: Literal["day", "week", "month"] = "day",
+):
     decode_jwt_token(request.headers.get("Authorization"))
-    return transaction_service.list_transactions(**request.GET.dict())
+    return transaction_service.summarize_transactions(filters, bucket)
 
 
-@transaction_router.patch("/verify-dates", response=str)
+@transaction_router.patch("/verify-dates", response=LateBillsSchema)
 def check_late_bills(request):
     decode_jwt_token(request.headers.get("Authorization"))
     return transaction_service.check_late_bills()
 
 
-@transaction_router.post("/omie", response=str)
-def sync_omie(request):
+@transaction_router.post("/omie", response=SyncJobSchema)
+def sync_omie(request, backfill_days: Optional[int] = None):
     decode_jwt_token(request.headers.get("Authorization"))
-    return omie_service.create_transactions()
+    return job_service.enqueue_job(SyncJob.OMIE, {"backfill_days": backfill_days})
 
 
-@transaction_router.patch("/toskani", response=str)
+@transaction_router.patch("/toskani", response=SyncJobSchema)
 def sync_toskani(request):
     decode_jwt_token(request.headers.get("Authorization"))
-    return toskani_service.consult_toskani()
+    return job_service.enqueue_job(SyncJob.TOSKANI)
+
+
+@transaction_router.get("/jobs/{job_id}", response=SyncJobSchema)
+def get_sync_job(request, job_id: uuid.UUID):
+    decode_jwt_token(request.headers.get("Authorization"))
+    return job_service.get_job(job_id)
@@ -0,0 +1,108 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.transactions.services.reconciliation_service import (
+    RECONCILIATION_STATUSES,
+    reconcile_batch,
+)
+
+
+class _Row:
+    __slots__ = (
+        "balance",
+        "toskani_value",
+        "fee",
+        "received_value",
+        "acquirer_fee",
+        "value_difference",
+        "status",
+    )
+
+    def __init__(self, balance: int, toskani_value: int, fee: int):
+        self.balance = balance
+        self.toskani_value = toskani_value
+        self.fee = fee
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara a conciliação por objeto com a conciliação em lote (em centavos) "
+        "para 10k, 100k e 1M linhas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            nargs="+",
+            default=[10_000, 100_000, 1_000_000],
+            help="Quantidades de linhas a medir.",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **kwargs):
+        rng = random.Random(kwargs["seed"])
+
+        for size in kwargs["rows"]:
+            rows = []
+            for _ in range(size):
+                value = rng.randint(1_000, 500_000)
+                fee = value * rng.randint(100, 500) // 10_000
+                received = (
+                    value if rng.random() < 0.9 else value * rng.randint(50, 99) // 100
+                )
+                rows.append(_Row(value - fee, received, fee))
+
+            per_object = self._time(self._reconcile_per_object, rows)
+            expected = [(row.value_difference, row.status) for row in rows]
+
+            batch = self._time(self._reconcile_batch, rows)
+            assert expected == [(row.value_difference, row.status) for row in rows]
+
+            columns = (
+                [row.balance for row in rows],
+                [row.toskani_value for row in rows],
+                [row.fee for row in rows],
+            )
+            kernel = self._time(lambda columns: reconcile_batch(*columns), columns)
+
+            self.stdout.write(
+                f"{size:>9} linhas: por objeto {per_object:.3f}s, "
+                f"em lote {batch:.3f}s ({per_object / batch:.2f}x), "
+                f"somente o kernel {kernel:.3f}s ({per_object / kernel:.2f}x)"
+            )
+
+    @staticmethod
+    def _time(func, rows) -> float:
+        start = time.perf_counter()
+        func(rows)
+        return time.perf_counter() - start
+
+    @staticmethod
+    def _reconcile_per_object(rows) -> None:
+        for row in rows:
+            value_diff = row.balance - (row.toskani_value - row.fee)
+
+            row.received_value = row.toskani_value
+            row.acquirer_fee = row.fee
+            row.value_difference = value_diff
+            row.status = (
+                "Pagamento recebido com sucesso"
+                if abs(value_diff) * 10_000 <= 5 * row.toskani_value
+                else "Pagamento recebido parcialmente"
+            )
+
+    @staticmethod
+    def _reconcile_batch(rows) -> None:
+        differences, statuses = reconcile_batch(
+            [row.balance for row in rows],
+            [row.toskani_value for row in rows],
+            [row.fee for row in rows],
+        )
+        for row, difference, status in zip(rows, differences, statuses):
+            row.received_value = row.toskani_value
+            row.acquirer_fee = row.fee
+            row.value_difference = difference
+            row.status = RECONCILIATION_STATUSES[status]
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from apps.transactions.services.omie_service import OmieService
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa os lançamentos pendentes na API Omie (baixas, taxas e transferências)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Reagenda os itens que esgotaram as tentativas antes de processar.",
+        )
+
+    def handle(self, *args, **kwargs):
+        omie_service = OmieService()
+
+        if kwargs["retry_failed"]:
+            retried = omie_service.work_queue.retry_failed()
+            self.stdout.write(f"{retried} itens reagendados.")
+
+        processed = omie_service.work_queue.process_due()
+        self.stdout.write(f"{processed} itens processados.")
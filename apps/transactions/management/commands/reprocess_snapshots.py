@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from apps.transactions.services.omie_service import OmieService
+from apps.transactions.services.toskani_service import ToskaniService
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula os campos das Transactions a partir dos payloads Omie e "
+        "Toskani armazenados, sem consultar as APIs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            choices=["omie", "toskani", "all"],
+            default="all",
+            help="Origem dos payloads a reprocessar.",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["source"] in ("omie", "all"):
+            counts = OmieService().reprocess_snapshots()
+            self.stdout.write(f"Omie: {counts}")
+
+        if kwargs["source"] in ("toskani", "all"):
+            counts = ToskaniService().reprocess_snapshots()
+            self.stdout.write(f"Toskani: {counts}")
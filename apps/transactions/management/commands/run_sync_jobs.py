@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.transactions.services.job_service import JobService
+
+
+class Command(BaseCommand):
+    help = "Executa as sincronizações Omie e Toskani enfileiradas pela API."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Executa os jobs pendentes e encerra.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5,
+            help="Segundos de espera quando não há jobs pendentes.",
+        )
+
+    def handle(self, *args, **kwargs):
+        job_service = JobService()
+
+        while True:
+            close_old_connections()
+
+            if job := job_service.run_next_job():
+                self.stdout.write(f"Job {job.id} ({job.kind}): {job.status}")
+                continue
+
+            if kwargs["once"]:
+                break
+
+            time.sleep(kwargs["poll_interval"])
@@ -1,44 +1,167 @@
-from datetime import datetime, timedelta
+import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Optional
 
 from django.core.management.base import BaseCommand
+from django.db import transaction as transaction_django
+from django.db.models import QuerySet
 
-from apps.transactions.models import Transaction
+from apps.transactions.models import SyncCursor, Transaction
 from apps.transactions.services.omie_service import OmieService
+from apps.transactions.services.transactions_service import (
+    invalidate_transaction_summary,
+)
 
 
 class Command(BaseCommand):
-    help = "Consulta cada Transaction pelo cod_id_omie e atualiza o campo expected_date com a data_registro da API Omie."
+    help = (
+        "Consulta cada Transaction pelo cod_id_omie e atualiza o campo "
+        "expected_date com a data_registro da API Omie."
+    )
 
-    def handle(self, *args, **kwargs):
-        omie_service = OmieService()
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Quantidade de consultas simultâneas à API Omie.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Transações consultadas e gravadas por lote.",
+        )
+        parser.add_argument(
+            "--since",
+            type=date.fromisoformat,
+            default=None,
+            help=(
+                "Considera apenas transações com expected_date a partir desta "
+                "data (AAAA-MM-DD)."
+            ),
+        )
+        parser.add_argument(
+            "--account",
+            type=uuid.UUID,
+            default=None,
+            help="Considera apenas transações desta conta.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Consulta e exibe as alterações sem gravá-las.",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignora o checkpoint salvo e recomeça do início.",
+        )
 
-        transactions = Transaction.objects.all()
+    def handle(self, *args, **kwargs):
+        self.omie_service = OmieService()
+        self.dry_run = kwargs["dry_run"]
 
-        print(transactions.count())
+        transactions, cursor = self._scope(kwargs)
+        self.stdout.write(f"{transactions.count()} transações a consultar")
 
-        for transaction in transactions:
-            cod_id_omie = transaction.cod_id_omie
-            self.stdout.write(f"Consultando cod_id_omie: {cod_id_omie}")
+        counts = {"consulted": 0, "updated": 0, "failed": 0}
+        with ThreadPoolExecutor(max_workers=kwargs["workers"]) as executor:
+            last_id = cursor.last_synced_id
+            while batch := self._next_batch(
+                transactions, last_id, kwargs["batch_size"]
+            ):
+                results = executor.map(
+                    self.omie_service.consult_omie_transaction,
+                    [transaction.cod_id_omie for transaction in batch],
+                )
+                changed = [
+                    transaction
+                    for transaction, result in zip(batch, results)
+                    if self._apply_result(transaction, result, counts)
+                ]
+                last_id = batch[-1].cod_id_omie
+                self._save_batch(changed, cursor, last_id)
 
-            if result := omie_service.consult_omie_transaction(cod_id_omie):
-                register_date = result.get("expected_date")
+                counts["consulted"] += len(batch)
+                counts["updated"] += len(changed)
                 self.stdout.write(
-                    f"Transação {cod_id_omie} consultada com sucesso: data_registro={register_date}"
+                    f"{counts['consulted']} consultadas, {counts['updated']} alteradas, "
+                    f"{counts['failed']} com erro"
                 )
 
-                if register_date:
-                    installment = int(transaction.installment.split("/")[0])
-                    days_plus = (
-                        (installment - 1) * 30
-                    ) + transaction.account.days_to_receive
-                    date_obj = datetime.strptime(register_date, "%d/%m/%Y").date()
-                    date_obj += timedelta(days=days_plus)
-
-                    if transaction.expected_date != date_obj:
-                        transaction.expected_date = date_obj
-                        transaction.save()
-                        self.stdout.write(
-                            f"Transação {cod_id_omie} atualizada: expected_date={date_obj}"
-                        )
-            else:
-                self.stdout.write(f"Erro ao consultar cod_id_omie: {cod_id_omie}")
+        if self.dry_run:
+            return
+
+        # Finished scans start over next time
+        SyncCursor.objects.filter(source=cursor.source).delete()
+        if counts["updated"]:
+            invalidate_transaction_summary()
+
+    def _scope(self, kwargs) -> tuple[QuerySet, SyncCursor]:
+        transactions = Transaction.objects.select_related("account").order_by(
+            "cod_id_omie"
+        )
+        if kwargs["since"]:
+            transactions = transactions.filter(expected_date__gte=kwargs["since"])
+        if kwargs["account"]:
+            transactions = transactions.filter(account_id=kwargs["account"])
+
+        scope = hashlib.md5(f"{kwargs['since']}|{kwargs['account']}".encode())
+        source = f"{SyncCursor.SYNC_DATES}:{scope.hexdigest()[:12]}"
+        cursor = SyncCursor.objects.filter(source=source).first() or SyncCursor(
+            source=source
+        )
+        if kwargs["restart"]:
+            cursor.last_synced_id = None
+
+        if cursor.last_synced_id:
+            self.stdout.write(f"Retomando após cod_id_omie {cursor.last_synced_id}")
+            transactions = transactions.filter(cod_id_omie__gt=cursor.last_synced_id)
+
+        return transactions, cursor
+
+    @staticmethod
+    def _next_batch(
+        transactions: QuerySet, last_id: Optional[int], batch_size: int
+    ) -> list[Transaction]:
+        if last_id:
+            transactions = transactions.filter(cod_id_omie__gt=last_id)
+        return list(transactions[:batch_size])
+
+    def _apply_result(
+        self, transaction: Transaction, result: dict, counts: dict
+    ) -> bool:
+        if not result:
+            counts["failed"] += 1
+            self.stdout.write(
+                f"Erro ao consultar cod_id_omie: {transaction.cod_id_omie}"
+            )
+            return False
+
+        date_obj = self.omie_service.compute_expected_date(
+            transaction, result.get("expected_date")
+        )
+        if not date_obj or transaction.expected_date == date_obj:
+            return False
+
+        self.stdout.write(
+            f"Transação {transaction.cod_id_omie}: expected_date "
+            f"{transaction.expected_date} -> {date_obj}"
+        )
+        transaction.expected_date = date_obj
+        return True
+
+    def _save_batch(
+        self, changed: list[Transaction], cursor: SyncCursor, last_id: int
+    ) -> None:
+        if self.dry_run:
+            return
+
+        self.omie_service.snapshots.flush()
+        with transaction_django.atomic():
+            Transaction.objects.bulk_update(changed, ["expected_date"])
+            cursor.last_synced_id = last_id
+            cursor.save()
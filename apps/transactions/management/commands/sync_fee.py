@@ -1,50 +1,50 @@
 from datetime import datetime
 
 from django.core.management.base import BaseCommand
-from django.db.models import Q
+from django.db import transaction as transaction_django
+from django.db.models import Min
 from django.utils import timezone
 
-from apps.transactions.models import Transaction
+from apps.transactions.models import Transaction, TransactionWorkItem
 from apps.transactions.services.omie_service import OmieService
+from apps.transactions.services.work_queue_service import WorkQueueService
 
 
 class Command(BaseCommand):
-    help = "Consulta cada Transaction pelo cod_id_omie e atualiza com os dados da API Omie."
+    help = "Consulta os lançamentos de taxa na API Omie e marca as Transactions já lançadas."
 
     def handle(self, *args, **kwargs):
         omie_service = OmieService()
 
-        int_codes = omie_service.consult_omie_fee()
-
-        transactions = Transaction.objects.filter(
-            (
-                Q(omie_receipt_releasead=False)
-                | Q(omie_fee_launched=False)
-                | (
-                    Q(omie_value_transferred=False)
-                    & Q(account__omie_account_destiny__isnull=False)
-                )
-            )
-            & Q(expected_date__lte=timezone.now().date())
-            & Q(expected_date__gte=datetime(2024, 12, 1))
+        transactions = Transaction.objects.pending_sync().filter(
+            expected_date__gte=datetime(2024, 12, 1), omie_fee_launched=False
         )
 
-        print(transactions.count())
+        # Fees are only launched after the expected date, so older entries never match
+        date_from = transactions.aggregate(date_from=Min("expected_date"))["date_from"]
+        if not date_from:
+            self.stdout.write("Nenhuma transação pendente de taxa.")
+            return
 
-        for transaction in transactions:
+        int_codes = omie_service.consult_omie_fee(date_from, timezone.now().date())
+        self.stdout.write(f"{len(int_codes)} lançamentos encontrados na Omie")
+
+        launched = []
+        for transaction in transactions.only("id", "tid", "installment"):
             identifier = f"{transaction.tid}-{transaction.installment}"
             if identifier in int_codes:
+                transaction.omie_fee_launched = True
+                launched.append(transaction)
                 self.stdout.write(
                     self.style.SUCCESS(f"Transaction {identifier} foi lançado.")
                 )
 
-                if not transaction.omie_fee_launched:
-                    transaction.omie_fee_launched = True
-                    transaction.save()
-                    self.stdout.write(
-                        f"Transação {identifier} atualizada: omie_fee_launched=True"
-                    )
-            else:
-                self.stdout.write(
-                    self.style.WARNING(f"Transaction {identifier} não foi lançado.")
-                )
+        with transaction_django.atomic():
+            Transaction.objects.bulk_update(launched, ["omie_fee_launched"])
+            WorkQueueService.complete(
+                [transaction.id for transaction in launched], TransactionWorkItem.FEE
+            )
+
+        self.stdout.write(
+            f"{len(launched)} transações atualizadas: omie_fee_launched=True"
+        )
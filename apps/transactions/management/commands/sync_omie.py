@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from apps.transactions.services.omie_service import OmieService
+
+
+class Command(BaseCommand):
+    help = "Importa as contas a receber da API Omie desde a última sincronização."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backfill-days",
+            type=int,
+            default=None,
+            help="Reprocessa os últimos N dias, mesmo que já sincronizados.",
+        )
+        parser.add_argument(
+            "--consult-all",
+            action="store_true",
+            help="Consulta cada conta a receber em vez de usar apenas a listagem.",
+        )
+
+    def handle(self, *args, **kwargs):
+        omie_service = OmieService()
+
+        omie_service.create_transactions(
+            kwargs["backfill_days"], list_only=not kwargs["consult_all"]
+        )
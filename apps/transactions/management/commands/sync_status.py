@@ -1,51 +1,131 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta
+
 from django.core.management.base import BaseCommand
-from django.db.models import Q
+from django.db import transaction as transaction_django
 from django.utils import timezone
 
-from apps.transactions.models import Transaction
+from apps.transactions.models import Transaction, TransactionWorkItem
 from apps.transactions.services.omie_service import OmieService
+from apps.transactions.services.work_queue_service import WorkQueueService
 
 
 class Command(BaseCommand):
-    help = "Consulta cada Transaction pelo cod_id_omie e atualiza com os dados da API Omie."
+    help = (
+        "Consulta as contas a receber baixadas na API Omie e atualiza as Transactions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--margin-days",
+            type=int,
+            default=30,
+            help="Dias adicionais antes da data de registro mais antiga na listagem Omie.",
+        )
 
     def handle(self, *args, **kwargs):
-        omie_service = OmieService()
-
-        transactions = Transaction.objects.filter(
-            (
-                Q(omie_receipt_releasead=False)
-                | Q(omie_fee_launched=False)
-                | (
-                    Q(omie_value_transferred=False)
-                    & Q(account__omie_account_destiny__isnull=False)
-                )
+        self.omie_service = OmieService()
+
+        transactions = list(
+            Transaction.objects.pending_sync()
+            .filter(
+                expected_date__gte=datetime(2024, 12, 1), omie_receipt_releasead=False
             )
-            & Q(expected_date__lte=timezone.now().date())
-            & Q(expected_date__gte=datetime(2024, 12, 1))
+            .select_related("account")
         )
+        self.stdout.write(f"{len(transactions)} transações pendentes de baixa")
+        if not transactions:
+            return
+
+        listed, to_consult, register_dates = self._split_by_register_date(transactions)
 
-        print(transactions.count())
+        statuses = {}
+        if listed:
+            start = min(register_dates) - timedelta(days=kwargs["margin_days"])
+            statuses = self._list_statuses(listed, start, to_consult)
+        statuses.update(self._consult_statuses(to_consult))
 
+        self._release(transactions, statuses)
+
+    @staticmethod
+    def _split_by_register_date(
+        transactions: list[Transaction],
+    ) -> tuple[list[Transaction], list[Transaction], list[date]]:
+        # expected_date is data_registro plus the installment offset. The offset
+        # uses the account's current days_to_receive, which may have changed since
+        # ingestion, so the window starts --margin-days before the oldest date
+        listed, to_consult, register_dates = [], [], []
         for transaction in transactions:
-            cod_id_omie = transaction.cod_id_omie
-            self.stdout.write(f"Consultando cod_id_omie: {cod_id_omie}")
+            try:
+                installment = int(transaction.installment.split("/")[0])
+            except (AttributeError, ValueError):
+                to_consult.append(transaction)
+                continue
+            listed.append(transaction)
+            register_dates.append(
+                transaction.expected_date
+                - timedelta(
+                    days=(installment - 1) * 30 + transaction.account.days_to_receive
+                )
+            )
+
+        return listed, to_consult, register_dates
+
+    def _list_statuses(
+        self, listed: list[Transaction], start: date, to_consult: list[Transaction]
+    ) -> dict:
+        try:
+            receivables = self.omie_service.list_omie_receivables(
+                start, timezone.now().date(), filtrar_por_status="RECEBIDO"
+            )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            self.stdout.write(self.style.WARNING(f"Listagem Omie falhou: {e}"))
+            to_consult.extend(listed)
+            return {}
 
-            if result := omie_service.consult_omie_transaction(cod_id_omie):
-                title_status = result.get("title_status")
+        statuses = {}
+        candidate_ids = {transaction.cod_id_omie for transaction in listed}
+        for receivable in receivables:
+            cod_id_omie = receivable.get("codigo_lancamento_omie")
+            if cod_id_omie in candidate_ids:
+                statuses[cod_id_omie] = receivable.get("status_titulo")
+                self.omie_service.snapshots.add(cod_id_omie, receivable)
+
+        self.stdout.write(
+            f"{len(receivables)} contas recebidas listadas, "
+            f"{len(statuses)} pendentes no sistema"
+        )
+        return statuses
+
+    def _consult_statuses(self, to_consult: list[Transaction]) -> dict:
+        statuses = {}
+        for transaction in to_consult:
+            self.stdout.write(f"Consultando cod_id_omie: {transaction.cod_id_omie}")
+            if result := self.omie_service.consult_omie_transaction(
+                transaction.cod_id_omie
+            ):
+                statuses[transaction.cod_id_omie] = result.get("title_status")
+            else:
                 self.stdout.write(
-                    f"Transação {cod_id_omie} consultada com sucesso: {title_status}"
+                    f"Erro ao consultar cod_id_omie: {transaction.cod_id_omie}"
                 )
 
-                if (
-                    title_status == "RECEBIDO"
-                    and not transaction.omie_receipt_releasead
-                ):
-                    transaction.omie_receipt_releasead = True
-                    transaction.save()
-                    self.stdout.write(
-                        f"Transação {cod_id_omie} atualizada: omie_receipt_releasead=True"
-                    )
-            else:
-                self.stdout.write(f"Erro ao consultar cod_id_omie: {cod_id_omie}")
+        return statuses
+
+    def _release(self, transactions: list[Transaction], statuses: dict) -> None:
+        released = []
+        for transaction in transactions:
+            if statuses.get(transaction.cod_id_omie) == "RECEBIDO":
+                transaction.omie_receipt_releasead = True
+                released.append(transaction)
+
+        self.omie_service.snapshots.flush()
+        with transaction_django.atomic():
+            Transaction.objects.bulk_update(released, ["omie_receipt_releasead"])
+            WorkQueueService.complete(
+                [transaction.id for transaction in released],
+                TransactionWorkItem.RECEIPT,
+            )
+
+        self.stdout.write(
+            f"{len(released)} transações atualizadas: omie_receipt_releasead=True"
+        )
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.14 on 2026-10-18 13:44
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0009_transaction_order_number"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SyncCursor",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("source", models.CharField(max_length=50, unique=True)),
+                ("last_synced_date", models.DateField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
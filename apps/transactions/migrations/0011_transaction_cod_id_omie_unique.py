@@ -0,0 +1,45 @@
+# Generated by Django 4.2.14 on 2026-10-18 13:47
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicate_omie_ids(apps, schema_editor):
+    Transaction = apps.get_model("transactions", "Transaction")
+
+    duplicated_ids = (
+        Transaction.objects.values("cod_id_omie")
+        .annotate(total=Count("id"))
+        .filter(total__gt=1)
+        .values_list("cod_id_omie", flat=True)
+    )
+
+    for cod_id_omie in duplicated_ids:
+        keep = (
+            Transaction.objects.filter(cod_id_omie=cod_id_omie)
+            .order_by(
+                "-omie_receipt_releasead",
+                "-omie_fee_launched",
+                "-omie_value_transferred",
+                "received_value",
+            )
+            .values_list("id", flat=True)
+            .first()
+        )
+        Transaction.objects.filter(cod_id_omie=cod_id_omie).exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0010_synccursor"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_omie_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="transaction",
+            name="cod_id_omie",
+            field=models.BigIntegerField(unique=True),
+        ),
+    ]
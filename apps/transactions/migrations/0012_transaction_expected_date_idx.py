@@ -0,0 +1,19 @@
+# Generated by Django 4.2.14 on 2026-10-18 13:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0011_transaction_cod_id_omie_unique"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["expected_date", "id"], name="transaction_expected_date_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.14 on 2026-10-18 13:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0012_transaction_expected_date_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                condition=models.Q(
+                    ("omie_receipt_releasead", False),
+                    ("omie_fee_launched", False),
+                    ("omie_value_transferred", False),
+                    _connector="OR",
+                ),
+                fields=["expected_date", "account"],
+                name="transaction_pending_sync_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.14 on 2026-10-18 13:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0013_transaction_pending_sync_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TransactionWorkItem",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("receipt", "Receipt"),
+                            ("fee", "Fee"),
+                            ("transfer", "Transfer"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("due_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("claimed_until", models.DateTimeField(blank=True, null=True)),
+                ("attempts", models.IntegerField(default=0)),
+                (
+                    "transaction",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="work_items",
+                        to="transactions.transaction",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["due_at"], name="work_item_due_at_idx")
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="transactionworkitem",
+            constraint=models.UniqueConstraint(
+                fields=("transaction", "action"), name="unique_transaction_work_item"
+            ),
+        ),
+    ]
@@ -0,0 +1,58 @@
+from datetime import date
+
+from django.db import migrations
+from django.db.models import Q
+from django.utils import timezone
+
+# Older titles were never retried by the sync commands and may have been
+# settled by hand in Omie
+SEED_START_DATE = date(2024, 12, 1)
+
+
+def enqueue_pending_work(apps, schema_editor):
+    Transaction = apps.get_model("transactions", "Transaction")
+    TransactionWorkItem = apps.get_model("transactions", "TransactionWorkItem")
+
+    pending = Transaction.objects.filter(
+        Q(omie_receipt_releasead=False)
+        | Q(omie_fee_launched=False)
+        | Q(omie_value_transferred=False),
+        expected_date__gte=SEED_START_DATE,
+        expected_date__lte=timezone.now().date(),
+    )
+    items = []
+
+    for transaction in pending.select_related("account").iterator(chunk_size=2000):
+        reconciled = transaction.received_value is not None
+
+        if not transaction.omie_receipt_releasead and (
+            transaction.account.settle or reconciled
+        ):
+            items.append(TransactionWorkItem(transaction=transaction, action="receipt"))
+        if reconciled and not transaction.omie_fee_launched:
+            items.append(TransactionWorkItem(transaction=transaction, action="fee"))
+        if (
+            reconciled
+            and transaction.account.omie_account_destiny_id
+            and not transaction.omie_value_transferred
+        ):
+            items.append(
+                TransactionWorkItem(transaction=transaction, action="transfer")
+            )
+
+        if len(items) >= 2000:
+            TransactionWorkItem.objects.bulk_create(items, ignore_conflicts=True)
+            items = []
+
+    TransactionWorkItem.objects.bulk_create(items, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0014_transactionworkitem"),
+    ]
+
+    operations = [
+        migrations.RunPython(enqueue_pending_work, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.14 on 2026-10-18 13:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0016_syncjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transaction",
+            name="next_toskani_check_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="toskani_check_attempts",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="toskani_order_status",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
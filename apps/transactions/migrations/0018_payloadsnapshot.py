@@ -0,0 +1,50 @@
+# Generated by Django 4.2.14 on 2026-10-18 13:57
+
+from django.db import migrations, models
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0017_transaction_toskani_check_backoff"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PayloadSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[
+                            ("omie_receivable", "Omie receivable"),
+                            ("toskani_order", "Toskani order"),
+                        ],
+                        max_length=50,
+                    ),
+                ),
+                ("external_id", models.BigIntegerField()),
+                ("payload", models.BinaryField()),
+                ("fetched_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["source", "external_id", "fetched_at"],
+                        name="payload_snapshot_lookup_idx",
+                    )
+                ],
+            },
+        ),
+    ]
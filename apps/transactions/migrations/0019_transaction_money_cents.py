@@ -0,0 +1,67 @@
+# Generated by Django 4.2.14 on 2026-10-18 14:00
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Round
+
+MONEY_FIELDS = (
+    "expected_value",
+    "fee",
+    "balance",
+    "received_value",
+    "acquirer_fee",
+    "value_difference",
+)
+
+
+def reais_to_cents(apps, schema_editor):
+    Transaction = apps.get_model("transactions", "Transaction")
+    Transaction.objects.update(
+        **{field: Round(F(field) * 100) for field in MONEY_FIELDS}
+    )
+
+
+def cents_to_reais(apps, schema_editor):
+    Transaction = apps.get_model("transactions", "Transaction")
+    Transaction.objects.update(**{field: F(field) / 100.0 for field in MONEY_FIELDS})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0018_payloadsnapshot"),
+    ]
+
+    operations = [
+        migrations.RunPython(reais_to_cents, cents_to_reais),
+        migrations.AlterField(
+            model_name="transaction",
+            name="acquirer_fee",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="balance",
+            field=models.BigIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="expected_value",
+            field=models.BigIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="fee",
+            field=models.BigIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="received_value",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="value_difference",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.14 on 2026-10-18 14:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0019_transaction_money_cents"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                condition=models.Q(
+                    ("received_value__isnull", True),
+                    models.Q(("status", "Pagamento em atraso"), _negated=True),
+                ),
+                fields=["expected_date"],
+                name="transaction_unpaid_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.14 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0020_transaction_unpaid_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="synccursor",
+            name="last_synced_id",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.14 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0021_synccursor_last_synced_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transactionworkitem",
+            name="failed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
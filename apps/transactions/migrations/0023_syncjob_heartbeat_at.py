@@ -0,0 +1,18 @@
+# Generated by Django 4.2.14 on 2026-10-18 14:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0022_transactionworkitem_failed_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="syncjob",
+            name="heartbeat_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
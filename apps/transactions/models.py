@@ -1,18 +1,47 @@
+from datetime import date
+from typing import Optional
 from uuid import uuid4
 
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 
 from apps.accounts.models import Account
 
+LATE_PAYMENT_STATUS = "Pagamento em atraso"
+
+UNPAID_NOT_LATE = Q(received_value__isnull=True) & ~Q(status=LATE_PAYMENT_STATUS)
+
+PENDING_RECEIPT_OR_FEE = Q(omie_receipt_releasead=False) | Q(omie_fee_launched=False)
+
+PENDING_OMIE_FLAGS = PENDING_RECEIPT_OR_FEE | Q(omie_value_transferred=False)
+
+
+class TransactionQuerySet(models.QuerySet):
+    def pending_sync(self, until: Optional[date] = None):
+        # PENDING_OMIE_FLAGS is the partial index predicate; the second term
+        # only drops pending transfers for accounts without a destination
+        return self.filter(
+            PENDING_OMIE_FLAGS,
+            PENDING_RECEIPT_OR_FEE | Q(account__omie_account_destiny__isnull=False),
+            expected_date__lte=until or timezone.now().date(),
+        )
+
+    def toskani_due(self):
+        return self.filter(
+            Q(next_toskani_check_at__isnull=True)
+            | Q(next_toskani_check_at__lte=timezone.now())
+        )
+
 
 class Transaction(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
-    cod_id_omie = models.BigIntegerField()
+    cod_id_omie = models.BigIntegerField(unique=True)
     account = models.ForeignKey(Account, on_delete=models.CASCADE)
     tid = models.CharField(max_length=50)
-    expected_value = models.FloatField()
-    fee = models.FloatField()
-    balance = models.FloatField()
+    expected_value = models.BigIntegerField()
+    fee = models.BigIntegerField()
+    balance = models.BigIntegerField()
     expected_date = models.DateField()
     accounts_receivable_note = models.TextField(blank=True, null=True)
     document_type = models.CharField(
@@ -22,9 +51,9 @@ class Transaction(models.Model):
     installment = models.CharField(max_length=255, blank=True, null=True)
     order_number = models.CharField(max_length=15, blank=True, null=True)
 
-    received_value = models.FloatField(blank=True, null=True)
-    acquirer_fee = models.FloatField(blank=True, null=True)
-    value_difference = models.FloatField(blank=True, null=True)
+    received_value = models.BigIntegerField(blank=True, null=True)
+    acquirer_fee = models.BigIntegerField(blank=True, null=True)
+    value_difference = models.BigIntegerField(blank=True, null=True)
     payment_date = models.DateField(blank=True, null=True)
     status = models.CharField(max_length=50, blank=True, null=True)
     project = models.BigIntegerField(blank=True, null=True)
@@ -34,5 +63,142 @@ class Transaction(models.Model):
     omie_fee_launched = models.BooleanField(default=False)
     omie_value_transferred = models.BooleanField(default=False)
 
+    toskani_order_status = models.IntegerField(blank=True, null=True)
+    toskani_check_attempts = models.PositiveIntegerField(default=0)
+    next_toskani_check_at = models.DateTimeField(blank=True, null=True)
+
+    objects = TransactionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["expected_date", "id"], name="transaction_expected_date_idx"
+            ),
+            models.Index(
+                fields=["expected_date", "account"],
+                condition=PENDING_OMIE_FLAGS,
+                name="transaction_pending_sync_idx",
+            ),
+            models.Index(
+                fields=["expected_date"],
+                condition=UNPAID_NOT_LATE,
+                name="transaction_unpaid_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"TID {str(self.tid)} - Installment {self.installment}"
+
+
+class TransactionWorkItem(models.Model):
+    RECEIPT = "receipt"
+    FEE = "fee"
+    TRANSFER = "transfer"
+
+    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    transaction = models.ForeignKey(
+        Transaction, related_name="work_items", on_delete=models.CASCADE
+    )
+    action = models.CharField(
+        max_length=20,
+        choices=[(RECEIPT, "Receipt"), (FEE, "Fee"), (TRANSFER, "Transfer")],
+    )
+    due_at = models.DateTimeField(default=timezone.now)
+    claimed_until = models.DateTimeField(blank=True, null=True)
+    attempts = models.IntegerField(default=0)
+    failed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["transaction", "action"], name="unique_transaction_work_item"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["due_at"], name="work_item_due_at_idx"),
+        ]
+
+    def __str__(self):
+        return f"Work item {self.action} - Transaction {self.transaction_id}"
+
+
+class SyncCursor(models.Model):
+    OMIE_RECEIVABLES = "omie_receivables"
+    SYNC_DATES = "sync_dates"
+
+    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    source = models.CharField(max_length=50, unique=True)
+    last_synced_date = models.DateField(blank=True, null=True)
+    last_synced_id = models.BigIntegerField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Sync cursor {self.source} - {self.last_synced_date}"
+
+
+class SyncJob(models.Model):
+    OMIE = "omie"
+    TOSKANI = "toskani"
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    kind = models.CharField(
+        max_length=20, choices=[(OMIE, "Omie"), (TOSKANI, "Toskani")]
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            (QUEUED, "Queued"),
+            (RUNNING, "Running"),
+            (SUCCEEDED, "Succeeded"),
+            (FAILED, "Failed"),
+        ],
+        default=QUEUED,
+    )
+    params = models.JSONField(default=dict, blank=True)
+    progress = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="sync_job_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"Sync job {self.kind} - {self.status}"
+
+
+class PayloadSnapshot(models.Model):
+    OMIE_RECEIVABLE = "omie_receivable"
+    TOSKANI_ORDER = "toskani_order"
+
+    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    source = models.CharField(
+        max_length=50,
+        choices=[
+            (OMIE_RECEIVABLE, "Omie receivable"),
+            (TOSKANI_ORDER, "Toskani order"),
+        ],
+    )
+    external_id = models.BigIntegerField()
+    payload = models.BinaryField()
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["source", "external_id", "fetched_at"],
+                name="payload_snapshot_lookup_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Snapshot {self.source} {self.external_id} - {self.fetched_at}"
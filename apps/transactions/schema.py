@@ -1,10 +1,11 @@
 import uuid
-from datetime import date
+from datetime import date, datetime
 from typing import Optional
 
-from ninja import Schema
+from ninja import Field, FilterSchema, Schema
 
 from apps.accounts.schema import AccountDashboardSchema
+from utils.money import to_reais
 
 
 class TransactionSchema(Schema):
@@ -23,7 +24,82 @@ class TransactionSchema(Schema):
     status: Optional[str]
     installment: Optional[str]
 
+    @staticmethod
+    def resolve_expected_value(obj) -> Optional[float]:
+        return to_reais(obj.expected_value)
+
+    @staticmethod
+    def resolve_fee(obj) -> Optional[float]:
+        return to_reais(obj.fee)
+
+    @staticmethod
+    def resolve_balance(obj) -> Optional[float]:
+        return to_reais(obj.balance)
+
+    @staticmethod
+    def resolve_received_value(obj) -> Optional[float]:
+        return to_reais(obj.received_value)
+
+    @staticmethod
+    def resolve_value_difference(obj) -> Optional[float]:
+        return to_reais(obj.value_difference)
+
+
+class TransactionFilterSchema(FilterSchema):
+    status: Optional[str] = None
+    document_type: Optional[str] = None
+    account: Optional[uuid.UUID] = Field(None, q="account_id")
+    expected_date_from: Optional[date] = Field(None, q="expected_date__gte")
+    expected_date_to: Optional[date] = Field(None, q="expected_date__lte")
+    payment_date_from: Optional[date] = Field(None, q="payment_date__gte")
+    payment_date_to: Optional[date] = Field(None, q="payment_date__lte")
+
 
 class TransactionListSchema(Schema):
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
     transactions: list[TransactionSchema]
+
+
+class TransactionSummaryRowSchema(Schema):
+    period: date
+    account_id: uuid.UUID
+    status: Optional[str]
+    document_type: str
+    count: int
+    total_expected_value: float
+    total_received_value: Optional[float]
+    total_fee: float
+    total_acquirer_fee: Optional[float]
+    total_value_difference: Optional[float]
+
+
+class TransactionSummarySchema(Schema):
+    bucket: str
+    rows: list[TransactionSummaryRowSchema]
+
+
+class LateBillsSchema(Schema):
+    late: int
+
+
+class SyncJobSchema(Schema):
+    id: uuid.UUID
+    kind: str
+    status: str
+    params: dict
+    progress: dict
+    error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    heartbeat_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    duration: Optional[float] = None
+
+    @staticmethod
+    def resolve_duration(obj) -> Optional[float]:
+        if not obj.started_at:
+            return None
+        return (
+            (obj.finished_at or datetime.now(obj.started_at.tzinfo)) - obj.started_at
+        ).total_seconds()
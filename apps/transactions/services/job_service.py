@@ -0,0 +1,110 @@
+import logging
+import threading
+import uuid
+from datetime import timedelta
+from http import HTTPStatus
+from typing import Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db import transaction as transaction_django
+from django.db.models import Q
+from django.utils import timezone
+from ninja.errors import HttpError
+
+from apps.transactions.models import SyncJob
+from apps.transactions.services.omie_service import OmieService
+from apps.transactions.services.toskani_service import ToskaniService
+
+logger = logging.getLogger(__name__)
+
+
+class JobService:
+    def get_job_by_id(self, job_id: uuid.UUID) -> SyncJob:
+        return SyncJob.objects.filter(id=job_id).first()
+
+    def get_job(self, job_id: uuid.UUID) -> SyncJob:
+        if not (job := self.get_job_by_id(job_id)):
+            raise HttpError(HTTPStatus.NOT_FOUND, "Job não encontrado")
+
+        return job
+
+    def enqueue_job(self, kind: str, params: Optional[dict] = None) -> SyncJob:
+        return SyncJob.objects.create(kind=kind, params=params or {})
+
+    def fail_stale_jobs(self) -> int:
+        now = timezone.now()
+        stale_before = now - timedelta(seconds=settings.SYNC_JOB_STALE_SECONDS)
+        stale = SyncJob.objects.filter(
+            Q(heartbeat_at__lt=stale_before)
+            | Q(heartbeat_at__isnull=True, started_at__lt=stale_before),
+            status=SyncJob.RUNNING,
+        )
+        failed = stale.update(
+            status=SyncJob.FAILED,
+            error="Worker parou de responder durante a execução",
+            finished_at=now,
+        )
+        if failed:
+            logger.warning("%s stale sync jobs marked as failed", failed)
+        return failed
+
+    def run_next_job(self) -> Optional[SyncJob]:
+        self.fail_stale_jobs()
+
+        with transaction_django.atomic():
+            job = (
+                SyncJob.objects.select_for_update(skip_locked=True)
+                .filter(status=SyncJob.QUEUED)
+                .order_by("created_at")
+                .first()
+            )
+            if not job:
+                return None
+
+            job.status = SyncJob.RUNNING
+            job.started_at = job.heartbeat_at = timezone.now()
+            job.save(update_fields=["status", "started_at", "heartbeat_at"])
+
+        self.run_job(job)
+        return job
+
+    def run_job(self, job: SyncJob) -> None:
+        def report(progress: dict) -> None:
+            job.progress = progress
+            job.save(update_fields=["progress"])
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(job.id, stop), daemon=True
+        )
+        heartbeat.start()
+
+        try:
+            if job.kind == SyncJob.OMIE:
+                counts = OmieService().create_transactions(
+                    progress=report, **job.params
+                )
+            else:
+                counts = ToskaniService().consult_toskani(progress=report, **job.params)
+
+            job.progress = counts
+            job.status = SyncJob.SUCCEEDED
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.exception("Sync job %s failed", job.id)
+            job.status = SyncJob.FAILED
+            job.error = str(e)
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        job.finished_at = timezone.now()
+        job.save(update_fields=["progress", "status", "error", "finished_at"])
+
+    @staticmethod
+    def _heartbeat(job_id: uuid.UUID, stop: threading.Event) -> None:
+        try:
+            while not stop.wait(settings.SYNC_JOB_HEARTBEAT_SECONDS):
+                SyncJob.objects.filter(id=job_id).update(heartbeat_at=timezone.now())
+        finally:
+            connection.close()
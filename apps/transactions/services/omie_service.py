@@ -1,31 +1,152 @@
-import json
+import logging
 import os
 from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from functools import partial
+from typing import Callable, Iterator, Optional
 
-import requests
+from django.conf import settings
 from django.db import transaction as transaction_django
 
-from apps.accounts.models import Account, Installment, OmieAccount
-from apps.transactions.models import Transaction
+from apps.accounts.services.fee_cache import installment_fee_cache
+from apps.accounts.services.fee_table import AccountFeeTable
+from apps.transactions.models import (
+    PayloadSnapshot,
+    SyncCursor,
+    Transaction,
+    TransactionWorkItem,
+)
+from apps.transactions.services.snapshot_service import (
+    SnapshotBuffer,
+    latest_snapshots,
+)
+from apps.transactions.services.transactions_service import (
+    invalidate_transaction_summary,
+)
+from apps.transactions.services.work_queue_service import WorkQueueService
+from utils.money import percent_of, to_cents, to_reais
+from utils.omie_client import OmieResult, get_omie_client
+
+logger = logging.getLogger(__name__)
 
 
 class OmieService:
+    LIST_REQUIRED_FIELDS = (
+        "id_conta_corrente",
+        "nsu",
+        "valor_documento",
+        "numero_parcela",
+        "data_registro",
+        "codigo_tipo_documento",
+        "distribuicao",
+        "numero_pedido",
+    )
+
     def __init__(self):
         self.omie_app_key = str(os.getenv("OMIE_APP_KEY"))
         self.omie_app_secret = str(os.getenv("OMIE_APP_SECRET"))
-        self.base_url = "https://app.omie.com.br/api/v1/financas"
-        self.headers = {"Content-Type": "application/json"}
+        self.client = get_omie_client()
+        self.work_queue = WorkQueueService(self)
+        self.snapshots = SnapshotBuffer(PayloadSnapshot.OMIE_RECEIVABLE)
+
+    def create_transactions(
+        self,
+        backfill_days: Optional[int] = None,
+        list_only: Optional[bool] = None,
+        progress: Optional[Callable[[dict], None]] = None,
+    ) -> dict:
+        if list_only is None:
+            list_only = settings.OMIE_LIST_ONLY_INGESTION
+
+        counts = {
+            "ranges": 0,
+            "receivables": 0,
+            "created": 0,
+            "skipped": 0,
+            "work_items": 0,
+        }
+        cursor, _ = SyncCursor.objects.get_or_create(source=SyncCursor.OMIE_RECEIVABLES)
+
+        for date_from, date_to in self._pending_date_ranges(cursor, backfill_days):
+            receivables = self.get_omie_transactions(date_from, date_to)
+            transactions_data = self._build_transactions_data(receivables, list_only)
+            self.snapshots.flush()
+            with transaction_django.atomic():
+                created, skipped = self._bulk_create_transactions(transactions_data)
+                self.work_queue.enqueue(
+                    [t for t in created if t.account.settle],
+                    [TransactionWorkItem.RECEIPT],
+                )
+                # Skipped receivables are retried from this range once their
+                # account is configured, so the cursor must not move past it
+                if not counts["skipped"]:
+                    cursor.last_synced_date = date_from if skipped else date_to
+                    cursor.save(update_fields=["last_synced_date", "updated_at"])
+
+            if created:
+                invalidate_transaction_summary()
+
+            counts["ranges"] += 1
+            counts["receivables"] += len(receivables)
+            counts["created"] += len(created)
+            counts["skipped"] += len(skipped)
+            if progress:
+                progress(
+                    {**counts, "synced_until": cursor.last_synced_date.isoformat()}
+                )
+
+        if counts["skipped"]:
+            logger.warning(
+                "Omie sync cursor held at %s: %s receivables skipped",
+                cursor.last_synced_date,
+                counts["skipped"],
+            )
 
-    def create_transactions(self) -> str:
-        with transaction_django.atomic():
-            transaction_ids = self.get_omie_transactions()
-            with ThreadPoolExecutor(max_workers=3) as executor:
-                results = executor.map(self.consult_omie_transaction, transaction_ids)
+        counts["work_items"] = self.work_queue.process_due()
+
+        logger.info("Installment fee cache: %s", installment_fee_cache.stats())
+        return counts
+
+    def _pending_date_ranges(
+        self, cursor: SyncCursor, backfill_days: Optional[int] = None
+    ) -> Iterator[tuple[date, date]]:
+        today = datetime.now().date()
+
+        if backfill_days is not None:
+            start = today - timedelta(days=backfill_days)
+        else:
+            start = today - timedelta(days=settings.OMIE_BACKFILL_DAYS)
+            if cursor.last_synced_date:
+                start = max(start, cursor.last_synced_date)
+
+        while start <= today:
+            end = min(start + timedelta(days=settings.OMIE_SYNC_RANGE_DAYS - 1), today)
+            yield start, end
+            start = end + timedelta(days=1)
+
+    def _build_transactions_data(
+        self, receivables: list[dict], list_only: bool
+    ) -> list:
+        transactions_data = []
+        to_consult = []
+
+        for receivable in receivables:
+            if list_only and all(
+                receivable.get(field) for field in self.LIST_REQUIRED_FIELDS
+            ):
+                transactions_data.append(
+                    self._map_omie_receivable(
+                        receivable["codigo_lancamento_omie"], receivable
+                    )
+                )
+            else:
+                to_consult.append(receivable["codigo_lancamento_omie"])
 
-            transactions_data = [result for result in results if result]
-            self._bulk_create_transactions(transactions_data)
-            return "Success"
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            results = executor.map(self.consult_omie_transaction, to_consult)
+
+        transactions_data.extend(result for result in results if result)
+        return transactions_data
 
     def consult_omie_transaction(self, omie_id: int) -> dict:
         payload = {
@@ -36,59 +157,143 @@ class OmieService:
         }
 
         response = self._send_request(payload, "contareceber")
-        if response and response.status_code == 200:
-            transaction = response.json()
-            return {
-                "cod_id_omie": omie_id,
-                "omie_account_id": transaction.get("id_conta_corrente", "NULO"),
-                "tid": transaction.get("nsu", "NULO"),
-                "expected_value": transaction.get("valor_documento", 0.0),
-                "fee": transaction.get("numero_parcela", "001/001"),
-                "balance": 0.0,
-                "expected_date": transaction.get("data_registro", "NULO"),
-                "accounts_receivable_note": transaction.get("observacao", "NULO"),
-                "document_type": transaction.get("codigo_tipo_documento", "NULO"),
-                "status": "Aguardando pagamento",
-                "title_status": transaction.get("status_titulo", "NULO"),
-                "project": transaction.get("codigo_projeto", None),
-                "department": (transaction.get("distribuicao") or [{}])[0].get(
-                    "cCodDep", None
-                ),
-                "order_number": transaction.get("numero_pedido", "NULO"),
-            }
+        if response.ok:
+            self.snapshots.add(omie_id, response.data)
+            return self._map_omie_receivable(omie_id, response.data)
         return {}
 
-    def consult_omie_fee(self):
-        nPage = 1
-        nPerPage = 500
-        codes = []
+    @staticmethod
+    def compute_expected_date(
+        transaction: Transaction, register_date: str
+    ) -> Optional[date]:
+        if not register_date or register_date == "NULO":
+            return None
+
+        installment = int(transaction.installment.split("/")[0])
+        days_plus = ((installment - 1) * 30) + transaction.account.days_to_receive
+        return datetime.strptime(register_date, "%d/%m/%Y").date() + timedelta(
+            days=days_plus
+        )
+
+    def reprocess_snapshots(self) -> dict:
+        counts = {"snapshots": 0, "updated": 0}
+
+        for snapshots in latest_snapshots(PayloadSnapshot.OMIE_RECEIVABLE):
+            transactions = Transaction.objects.filter(
+                cod_id_omie__in=list(snapshots)
+            ).select_related("account")
+
+            updates = []
+            received_ids = []
+            for transaction in transactions:
+                data = self._map_omie_receivable(
+                    transaction.cod_id_omie, snapshots[transaction.cod_id_omie]
+                )
+                changed = False
+
+                expected_date = self.compute_expected_date(
+                    transaction, data["expected_date"]
+                )
+                if expected_date and transaction.expected_date != expected_date:
+                    transaction.expected_date = expected_date
+                    changed = True
+
+                if (
+                    data["title_status"] == "RECEBIDO"
+                    and not transaction.omie_receipt_releasead
+                ):
+                    transaction.omie_receipt_releasead = True
+                    received_ids.append(transaction.id)
+                    changed = True
+
+                if changed:
+                    updates.append(transaction)
+
+            with transaction_django.atomic():
+                Transaction.objects.bulk_update(
+                    updates, ["expected_date", "omie_receipt_releasead"]
+                )
+                WorkQueueService.complete(received_ids, TransactionWorkItem.RECEIPT)
+
+            counts["snapshots"] += len(snapshots)
+            counts["updated"] += len(updates)
+
+        if counts["updated"]:
+            invalidate_transaction_summary()
+
+        return counts
+
+    def _map_omie_receivable(self, omie_id: int, transaction: dict) -> dict:
+        return {
+            "cod_id_omie": omie_id,
+            "omie_account_id": transaction.get("id_conta_corrente", "NULO"),
+            "tid": transaction.get("nsu", "NULO"),
+            "expected_value": transaction.get("valor_documento", 0.0),
+            "fee": transaction.get("numero_parcela", "001/001"),
+            "balance": 0.0,
+            "expected_date": transaction.get("data_registro", "NULO"),
+            "accounts_receivable_note": transaction.get("observacao", "NULO"),
+            "document_type": transaction.get("codigo_tipo_documento", "NULO"),
+            "status": "Aguardando pagamento",
+            "title_status": transaction.get("status_titulo", "NULO"),
+            "project": transaction.get("codigo_projeto", None),
+            "department": (transaction.get("distribuicao") or [{}])[0].get(
+                "cCodDep", None
+            ),
+            "order_number": transaction.get("numero_pedido", "NULO"),
+        }
+
+    def consult_omie_fee(
+        self, date_from: Optional[date] = None, date_to: Optional[date] = None
+    ) -> set[str]:
+        return {
+            code
+            for page in self._list_omie_fee_pages(date_from, date_to)
+            for code in (item.get("cCodIntLanc") for item in page)
+            if code
+        }
+
+    def _list_omie_fee_pages(
+        self, date_from: Optional[date], date_to: Optional[date]
+    ) -> Iterator[list[dict]]:
+        filters = {}
+        if date_from:
+            filters["dDtIncDe"] = date_from.strftime("%d/%m/%Y")
+        if date_to:
+            filters["dDtIncAte"] = date_to.strftime("%d/%m/%Y")
 
+        page = 1
         while True:
             payload = {
                 "call": "ListarLancCC",
-                "param": [{"nPagina": nPage, "nRegPorPagina": nPerPage}],
+                "param": [
+                    {
+                        "nPagina": page,
+                        "nRegPorPagina": settings.OMIE_LIST_PAGE_SIZE,
+                        **filters,
+                    }
+                ],
                 "app_key": self.omie_app_key,
                 "app_secret": self.omie_app_secret,
             }
 
             response = self._send_request(payload, "contacorrentelancamentos")
+            if response.no_records:
+                return
+            if not response.ok:
+                raise Exception("Erro ao consultar API OMIE")
 
-            if response and response.status_code == 200:
-                data = response.json()
-                fees = data.get("listaLancamentos", [])
-
-                if not fees:
-                    break
-
-                codes.extend(item.get("cCodIntLanc") for item in fees)
+            fees = response.data.get("listaLancamentos", [])
+            if not fees:
+                return
 
-                nPage += 1
-            else:
-                raise Exception("Erro ao consultar API OMIE")
+            yield fees
 
-        return codes
+            if page >= (response.data.get("nTotPaginas") or page + 1):
+                return
+            page += 1
 
-    def release_omie_receipt(self, transaction: Transaction) -> bool:
+    def release_omie_receipt(self, transaction: Transaction) -> OmieResult:
         date = datetime.now().strftime("%d/%m/%Y")
         payment_date = (
             transaction.payment_date.strftime("%d/%m/%Y")
@@ -108,7 +313,7 @@ class OmieService:
                     "codigo_lancamento": transaction.cod_id_omie,
                     "codigo_baixa": 0,
                     "codigo_conta_corrente": transaction.account.omie_account_origin.omie_id,
-                    "valor": value,
+                    "valor": to_reais(value),
                     "data": payment_date if payment_date else date,
                     "observacao": "Baixa via sistema Conciliadora CC",
                 }
@@ -117,13 +322,9 @@ class OmieService:
             "app_secret": self.omie_app_secret,
         }
 
-        response = self._send_request(payload, "contareceber")
-        if response and response.status_code == 200:
-            return True
-
-        return False
+        return self._send_request(payload, "contareceber")
 
-    def launch_omie_fee(self, transaction: Transaction) -> bool:
+    def launch_omie_fee(self, transaction: Transaction) -> OmieResult:
         date = datetime.now().strftime("%d/%m/%Y")
         payment_date = (
             transaction.payment_date.strftime("%d/%m/%Y")
@@ -147,7 +348,7 @@ class OmieService:
             "cabecalho": {
                 "nCodCC": transaction.account.omie_account_origin.omie_id,
                 "dDtLanc": payment_date if payment_date else date,
-                "nValorLanc": transaction.acquirer_fee,
+                "nValorLanc": to_reais(transaction.acquirer_fee),
             },
             "detalhes": detalhes,
         }
@@ -155,7 +356,7 @@ class OmieService:
         if transaction.department:
             param_item["departamentos"] = {
                 "cCodDep": transaction.department,
-                "nValDep": transaction.acquirer_fee,
+                "nValDep": to_reais(transaction.acquirer_fee),
             }
 
         payload = {
@@ -165,13 +366,9 @@ class OmieService:
             "app_secret": self.omie_app_secret,
         }
 
-        response = self._send_request(payload, "contacorrentelancamentos")
-        if response and response.status_code == 200:
-            return True
+        return self._send_request(payload, "contacorrentelancamentos")
 
-        return False
-
-    def transfer_omie_value(self, transaction: Transaction) -> bool:
+    def transfer_omie_value(self, transaction: Transaction) -> OmieResult:
         date = datetime.now().strftime("%d/%m/%Y")
         payment_date = (
             transaction.payment_date.strftime("%d/%m/%Y")
@@ -195,7 +392,9 @@ class OmieService:
             "cabecalho": {
                 "nCodCC": transaction.account.omie_account_origin.omie_id,
                 "dDtLanc": payment_date if payment_date else date,
-                "nValorLanc": transaction.received_value - transaction.acquirer_fee,
+                "nValorLanc": to_reais(
+                    transaction.received_value - transaction.acquirer_fee
+                ),
             },
             "detalhes": detalhes,
             "transferencia": {
@@ -206,7 +405,9 @@ class OmieService:
         if transaction.department:
             param_item["departamentos"] = {
                 "cCodDep": transaction.department,
-                "nValDep": transaction.received_value - transaction.acquirer_fee,
+                "nValDep": to_reais(
+                    transaction.received_value - transaction.acquirer_fee
+                ),
             }
 
         payload = {
@@ -216,63 +417,96 @@ class OmieService:
             "app_secret": self.omie_app_secret,
         }
 
-        response = self._send_request(payload, "contacorrentelancamentos")
-        if response and response.status_code == 200:
-            return True
+        return self._send_request(payload, "contacorrentelancamentos")
 
-        return False
+    def get_omie_transactions(self, date_from: date, date_to: date) -> list[dict]:
+        candidates: dict[int, dict] = {}
 
-    def get_omie_transactions(self) -> list:
-        ids = []
-        date = datetime.now().strftime("%d/%m/%Y")
-        page = 1
-        existing_ids = set(Transaction.objects.values_list("cod_id_omie", flat=True))
+        for transaction in self.list_omie_receivables(date_from, date_to):
+            document_type = transaction.get("codigo_tipo_documento", "")
+            if document_type in ["PIX", "CRC", "CRD"]:
+                candidates.setdefault(
+                    transaction["codigo_lancamento_omie"], transaction
+                )
 
-        while True:
-            payload = {
-                "call": "ListarContasReceber",
-                "param": [
-                    {
-                        "pagina": page,
-                        "registros_por_pagina": 20,
-                        "apenas_importado_api": "N",
-                        "filtrar_por_data_de": date,
-                        "filtrar_por_data_ate": date,
-                    }
-                ],
-                "app_key": self.omie_app_key,
-                "app_secret": self.omie_app_secret,
-            }
+        ids = list(candidates)
+        for start in range(0, len(ids), settings.OMIE_LIST_PAGE_SIZE):
+            existing_ids = Transaction.objects.filter(
+                cod_id_omie__in=ids[start : start + settings.OMIE_LIST_PAGE_SIZE]
+            ).values_list("cod_id_omie", flat=True)
+            for cod_id_omie in existing_ids:
+                del candidates[cod_id_omie]
+
+        for cod_id_omie, transaction in candidates.items():
+            self.snapshots.add(cod_id_omie, transaction)
+
+        return list(candidates.values())
+
+    def list_omie_receivables(
+        self, date_from: date, date_to: date, **filters
+    ) -> list[dict]:
+        fetch_page = partial(
+            self._list_omie_receivables_page,
+            date_from=date_from,
+            date_to=date_to,
+            filters=filters,
+        )
+        first_page = fetch_page(1)
+        total_pages = first_page.get("total_de_paginas") or 1
 
-            response = self._send_request(payload, "contareceber")
-            if not response or response.status_code != 200:
-                break
+        with ThreadPoolExecutor(max_workers=settings.OMIE_PAGE_WORKERS) as executor:
+            pages = [first_page, *executor.map(fetch_page, range(2, total_pages + 1))]
 
-            data = response.json()
-            if not (transactions := data.get("conta_receber_cadastro", [])):
-                break
+        return [
+            receivable
+            for page in pages
+            for receivable in page.get("conta_receber_cadastro", [])
+        ]
 
-            for transaction in transactions:
-                cod_id_omie = transaction.get("codigo_lancamento_omie")
-                document_type = transaction.get("codigo_tipo_documento", "")
-                if (
-                    document_type in ["PIX", "CRC", "CRD"]
-                    and cod_id_omie not in existing_ids
-                ):
-                    ids.append(cod_id_omie)
-                    existing_ids.add(cod_id_omie)
+    def _list_omie_receivables_page(
+        self, page: int, date_from: date, date_to: date, filters: dict
+    ) -> dict:
+        payload = {
+            "call": "ListarContasReceber",
+            "param": [
+                {
+                    "pagina": page,
+                    "registros_por_pagina": settings.OMIE_LIST_PAGE_SIZE,
+                    "apenas_importado_api": "N",
+                    "filtrar_por_data_de": date_from.strftime("%d/%m/%Y"),
+                    "filtrar_por_data_ate": date_to.strftime("%d/%m/%Y"),
+                    **filters,
+                }
+            ],
+            "app_key": self.omie_app_key,
+            "app_secret": self.omie_app_secret,
+        }
 
-            page += 1
+        response = self._send_request(payload, "contareceber")
+        if response.no_records:
+            return {}
+        if not response.ok:
+            raise Exception("Erro ao consultar API OMIE")
 
-        return ids
+        return response.data
 
-    def _bulk_create_transactions(self, transactions_data: list) -> None:
+    def _bulk_create_transactions(
+        self, transactions_data: list
+    ) -> tuple[list[Transaction], list[int]]:
         transactions_to_create = []
+        skipped = []
         start_date = datetime(2024, 11, 1).date()
+        fee_table = AccountFeeTable()
 
         for data in transactions_data:
-            account_omie = OmieAccount.objects.get(omie_id=data["omie_account_id"])
-            account = Account.objects.get(omie_account_origin=account_omie)
+            if not (account := fee_table.get_account(data["omie_account_id"])):
+                logger.warning(
+                    "Omie %s skipped: no account for Omie account %s",
+                    data["cod_id_omie"],
+                    data["omie_account_id"],
+                )
+                skipped.append(data["cod_id_omie"])
+                continue
 
             doc_type = {"PIX": "PIX", "CRC": "CREDIT", "CRD": "DEBIT"}
             doc_chosen = doc_type[data["document_type"]]
@@ -286,21 +520,32 @@ class OmieService:
 
             if date_obj >= start_date:
                 fee_number = int(data["fee"].split("/")[1])
-                installment = Installment.objects.get(
-                    account=account, installment_number=fee_number
-                )
-                fee_percent = installment.fee
-                formatted_value = round(data["expected_value"], 2)
-                new_fee = round(formatted_value * (fee_percent / 100), 2)
-                new_balance = round(formatted_value - new_fee, 2)
+                if (fee_percent := fee_table.get_fee(account, fee_number)) is None:
+                    logger.warning(
+                        "Omie %s skipped: no installment %s for account %s",
+                        data["cod_id_omie"],
+                        fee_number,
+                        account.id,
+                    )
+                    skipped.append(data["cod_id_omie"])
+                    continue
+
+                if (expected_value := to_cents(data["expected_value"])) is None:
+                    logger.warning(
+                        "Omie %s skipped: no document value", data["cod_id_omie"]
+                    )
+                    skipped.append(data["cod_id_omie"])
+                    continue
+
+                new_fee = percent_of(expected_value, fee_percent)
 
                 transaction = Transaction(
                     cod_id_omie=data["cod_id_omie"],
                     account=account,
                     tid=data["tid"],
-                    expected_value=formatted_value,
+                    expected_value=expected_value,
                     fee=new_fee,
-                    balance=new_balance,
+                    balance=expected_value - new_fee,
                     expected_date=date_obj,
                     accounts_receivable_note=data["accounts_receivable_note"],
                     document_type=doc_chosen,
@@ -312,24 +557,18 @@ class OmieService:
                 )
                 transactions_to_create.append(transaction)
 
-        Transaction.objects.bulk_create(transactions_to_create)
+        Transaction.objects.bulk_create(transactions_to_create, ignore_conflicts=True)
 
-        for transaction in transactions_to_create:
-            if transaction.account.settle:
-                if self.release_omie_receipt(transaction):
-                    transaction.omie_receipt_releasead = True
-                    transaction.save()
-
-    def _send_request(self, payload: dict, endpoint: str):
-        try:
-            response = requests.post(
-                f"{self.base_url}/{endpoint}/",
-                headers=self.headers,
-                data=json.dumps(payload),
-                timeout=(5, 15),
+        created_ids = set()
+        ids = [transaction.id for transaction in transactions_to_create]
+        for start in range(0, len(ids), settings.OMIE_LIST_PAGE_SIZE):
+            created_ids.update(
+                Transaction.objects.filter(
+                    id__in=ids[start : start + settings.OMIE_LIST_PAGE_SIZE]
+                ).values_list("id", flat=True)
             )
-            response.raise_for_status()
-            return response
-        except requests.RequestException as e:
-            print(f"Request failed: {e}")
-            return None
+
+        return [t for t in transactions_to_create if t.id in created_ids], skipped
+
+    def _send_request(self, payload: dict, endpoint: str) -> OmieResult:
+        return self.client.post(f"financas/{endpoint}", payload)
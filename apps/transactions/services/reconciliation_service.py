@@ -0,0 +1,34 @@
+from typing import Sequence
+
+from utils.money import Cents
+
+RECEIVED = 0
+PARTIALLY_RECEIVED = 1
+
+RECONCILIATION_STATUSES = {
+    RECEIVED: "Pagamento recebido com sucesso",
+    PARTIALLY_RECEIVED: "Pagamento recebido parcialmente",
+}
+
+# 0.05% of the received value, in basis points
+TOLERANCE_BPS = 5
+
+
+def reconcile_batch(
+    balances: Sequence[Cents],
+    received_values: Sequence[Cents],
+    fees: Sequence[Cents],
+) -> tuple[list[Cents], list[int]]:
+    differences = [
+        balance - (value - fee)
+        for balance, value, fee in zip(balances, received_values, fees)
+    ]
+    statuses = [
+        (
+            RECEIVED
+            if abs(difference) * 10_000 <= TOLERANCE_BPS * value
+            else PARTIALLY_RECEIVED
+        )
+        for difference, value in zip(differences, received_values)
+    ]
+    return differences, statuses
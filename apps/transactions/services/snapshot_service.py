@@ -0,0 +1,71 @@
+import json
+import threading
+import zlib
+from typing import Iterator, Optional
+
+from django.conf import settings
+
+from apps.transactions.models import PayloadSnapshot
+
+
+def compress_payload(payload) -> bytes:
+    return zlib.compress(
+        json.dumps(
+            payload, separators=(",", ":"), ensure_ascii=False, default=str
+        ).encode()
+    )
+
+
+def decompress_payload(payload: bytes):
+    return json.loads(zlib.decompress(payload))
+
+
+class SnapshotBuffer:
+    def __init__(self, source: str, batch_size: Optional[int] = None):
+        self.source = source
+        self.batch_size = batch_size or settings.PAYLOAD_SNAPSHOT_BATCH_SIZE
+        self.pending: list[PayloadSnapshot] = []
+        self.lock = threading.Lock()
+
+    def add(self, external_id: int, payload) -> None:
+        if not settings.PAYLOAD_SNAPSHOTS_ENABLED or not external_id or not payload:
+            return
+
+        snapshot = PayloadSnapshot(
+            source=self.source,
+            external_id=external_id,
+            payload=compress_payload(payload),
+        )
+        with self.lock:
+            self.pending.append(snapshot)
+
+    def flush(self) -> int:
+        with self.lock:
+            pending, self.pending = self.pending, []
+
+        PayloadSnapshot.objects.bulk_create(pending, batch_size=self.batch_size)
+        return len(pending)
+
+
+def latest_snapshots(
+    source: str, chunk_size: Optional[int] = None
+) -> Iterator[dict[int, dict]]:
+    chunk_size = chunk_size or settings.PAYLOAD_SNAPSHOT_BATCH_SIZE
+    rows = (
+        PayloadSnapshot.objects.filter(source=source)
+        .order_by("external_id", "-fetched_at")
+        .values_list("external_id", "payload")
+        .iterator(chunk_size=chunk_size)
+    )
+
+    chunk: dict[int, dict] = {}
+    for external_id, payload in rows:
+        if external_id in chunk:
+            continue
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = {}
+        chunk[external_id] = decompress_payload(payload)
+
+    if chunk:
+        yield chunk
@@ -1,16 +1,32 @@
-import time
-from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime
-from functools import partial
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Optional
 
-import requests
+import httpx
+from django.conf import settings
 from django.db import transaction as transaction_django
 from django.db.models import Q
 from django.utils import timezone
 
-from apps.accounts.services.account_service import AccountService
-from apps.transactions.models import Transaction
+from apps.accounts.services.fee_cache import installment_fee_cache
+from apps.transactions.models import PayloadSnapshot, Transaction
 from apps.transactions.services.omie_service import OmieService
+from apps.transactions.services.reconciliation_service import (
+    RECONCILIATION_STATUSES,
+    reconcile_batch,
+)
+from apps.transactions.services.snapshot_service import (
+    SnapshotBuffer,
+    latest_snapshots,
+)
+from apps.transactions.services.transactions_service import (
+    invalidate_transaction_summary,
+)
+from apps.transactions.services.work_queue_service import WorkQueueService
+from utils.money import to_cents
+
+logger = logging.getLogger(__name__)
 
 
 class ToskaniService:
@@ -22,108 +38,255 @@ class ToskaniService:
             "Content-Type": "application/json",
         }
         self.omie_service = OmieService()
-        self.account_service = AccountService()
-
-    def consult_toskani(self) -> str:
-        transactions = Transaction.objects.filter(
-            (
-                Q(omie_receipt_releasead=False)
-                | Q(omie_fee_launched=False)
-                | (
-                    Q(omie_value_transferred=False)
-                    & Q(account__omie_account_destiny__isnull=False)
+        self.work_queue = WorkQueueService(self.omie_service)
+        self.snapshots = SnapshotBuffer(PayloadSnapshot.TOSKANI_ORDER)
+
+    def consult_toskani(
+        self,
+        progress: Optional[Callable[[dict], None]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> dict:
+        chunk_size = chunk_size or settings.TOSKANI_CHUNK_SIZE
+        candidates = (
+            Transaction.objects.pending_sync()
+            .toskani_due()
+            .filter(received_value__isnull=True)
+            .select_related("account")
+            .order_by("expected_date", "id")
+        )
+        counts = {"chunks": 0, "candidates": 0, "reconciled": 0, "rescheduled": 0}
+
+        last = None
+        while True:
+            chunk = candidates
+            if last:
+                chunk = chunk.filter(
+                    Q(expected_date__gt=last.expected_date)
+                    | Q(expected_date=last.expected_date, id__gt=last.id)
                 )
+            transactions = list(chunk[:chunk_size])
+            if not transactions:
+                break
+
+            last = transactions[-1]
+            results = self.consult_toskani_orders(transactions)
+            updates, rescheduled = self._reconcile_chunk(transactions, results)
+
+            counts["chunks"] += 1
+            counts["candidates"] += len(transactions)
+            counts["reconciled"] += len(updates)
+            counts["rescheduled"] += len(rescheduled)
+            if progress:
+                progress(dict(counts))
+
+        if counts["reconciled"]:
+            invalidate_transaction_summary()
+
+        logger.info("Installment fee cache: %s", installment_fee_cache.stats())
+        counts["work_items"] = self.work_queue.process_due()
+        return counts
+
+    def _reconcile_chunk(
+        self, transactions: list[Transaction], results: list[dict]
+    ) -> tuple[list[Transaction], list[Transaction]]:
+        updates = []
+        rescheduled = []
+        for transaction, toskani_data in zip(transactions, results):
+            if not toskani_data:
+                continue
+
+            if toskani_data["order_status"] != 2:
+                self._schedule_next_check(transaction, toskani_data["order_status"])
+                rescheduled.append(transaction)
+                continue
+
+            installment_number = int(transaction.installment.split("/")[0])
+            formatted_fee = installment_fee_cache.get_fee(
+                transaction.account_id, installment_number
             )
-            & Q(expected_date__lte=timezone.now().date())
+            if formatted_fee is None:
+                logger.warning(
+                    "Omie %s skipped: no installment %s for account %s",
+                    transaction.cod_id_omie,
+                    installment_number,
+                    transaction.account_id,
+                )
+                continue
+
+            transaction.acquirer_fee = to_cents(formatted_fee)
+            transaction.received_value = toskani_data["received_value"]
+            transaction.payment_date = toskani_data.get("payment_date")
+            transaction.toskani_order_status = toskani_data["order_status"]
+            transaction.toskani_check_attempts = 0
+            transaction.next_toskani_check_at = None
+            updates.append(transaction)
+
+        differences, statuses = reconcile_batch(
+            [transaction.balance for transaction in updates],
+            [transaction.received_value for transaction in updates],
+            [transaction.acquirer_fee for transaction in updates],
         )
+        for transaction, difference, status in zip(updates, differences, statuses):
+            transaction.value_difference = difference
+            transaction.status = RECONCILIATION_STATUSES[status]
+
+        if not updates and not rescheduled:
+            return updates, rescheduled
 
         with transaction_django.atomic():
-            with ThreadPoolExecutor(max_workers=3) as executor:
-                consult_func = partial(self.consult_toskani_by_order, sum_all=True)
-                results = executor.map(consult_func, transactions)
-
-            updates = []
-            for transaction, toskani_data in zip(transactions, results):
-                if toskani_data:
-                    installment_number = int(transaction.installment.split("/")[0])
-                    account = transaction.account
-
-                    formatted_value = round(toskani_data.get("received_value"), 2)
-                    formatted_fee = (
-                        self.account_service.get_installment_by_account_and_number(
-                            account, installment_number
-                        ).fee
-                    )
-                    value_diff = transaction.balance - (formatted_value - formatted_fee)
-                    tolerance = 0.0005 * formatted_value
-
-                    transaction.received_value = formatted_value
-                    transaction.acquirer_fee = formatted_fee
-                    transaction.value_difference = value_diff
-                    transaction.payment_date = toskani_data.get("payment_date")
-                    transaction.status = (
-                        "Pagamento recebido com sucesso"
-                        if abs(value_diff) <= tolerance
-                        else "Pagamento recebido parcialmente"
-                    )
-                    updates.append(transaction)
+            Transaction.objects.bulk_update(
+                rescheduled,
+                [
+                    "toskani_order_status",
+                    "toskani_check_attempts",
+                    "next_toskani_check_at",
+                ],
+            )
+
+            # Another run may have reconciled some rows while Toskani was queried
+            pending_ids = set(
+                Transaction.objects.select_for_update()
+                .filter(
+                    id__in=[transaction.id for transaction in updates],
+                    received_value__isnull=True,
+                )
+                .values_list("id", flat=True)
+            )
+            updates = [
+                transaction for transaction in updates if transaction.id in pending_ids
+            ]
 
             Transaction.objects.bulk_update(
                 updates,
-                ["received_value", "acquirer_fee", "value_difference", "status"],
+                [
+                    "received_value",
+                    "acquirer_fee",
+                    "value_difference",
+                    "payment_date",
+                    "status",
+                    "toskani_order_status",
+                    "toskani_check_attempts",
+                    "next_toskani_check_at",
+                ],
             )
+            self.work_queue.enqueue_reconciled(updates)
+
+        return updates, rescheduled
 
-            print(len(updates))
-            for transaction in updates:
-                time.sleep(2)
-                print(transaction.cod_id_omie)
-                self.process_transaction_updates(transaction)
-
-            return "Success"
-
-    def process_transaction_updates(self, transaction: Transaction):
-        if not transaction.account.settle:
-            if not transaction.omie_receipt_releasead:
-                if self.omie_service.release_omie_receipt(transaction):
-                    transaction.omie_receipt_releasead = True
-                    transaction.save()
-                    print("Release Receipt: OK")
-
-        if not transaction.omie_fee_launched:
-            if self.omie_service.launch_omie_fee(transaction):
-                transaction.omie_fee_launched = True
-                transaction.save()
-                print("Launch Fee: OK")
-
-        if transaction.account.omie_account_destiny:
-            if not transaction.omie_value_transferred:
-                if self.omie_service.transfer_omie_value(transaction):
-                    transaction.omie_value_transferred = True
-                    transaction.save()
-                    print("Transfer Value: OK")
+    @staticmethod
+    def _schedule_next_check(transaction: Transaction, order_status) -> None:
+        if order_status != transaction.toskani_order_status:
+            transaction.toskani_order_status = order_status
+            transaction.toskani_check_attempts = 0
+
+        delay = min(
+            settings.TOSKANI_CHECK_BACKOFF_MAX,
+            settings.TOSKANI_CHECK_BACKOFF_BASE * 2**transaction.toskani_check_attempts,
+        )
+        transaction.toskani_check_attempts += 1
+        transaction.next_toskani_check_at = timezone.now() + timedelta(seconds=delay)
 
     def consult_toskani_by_order(self, transaction: Transaction) -> dict:
+        return self.consult_toskani_orders([transaction])[0]
+
+    def consult_toskani_orders(self, transactions: list[Transaction]) -> list[dict]:
+        if not transactions:
+            return []
+
+        results = asyncio.run(self._consult_toskani_orders(transactions))
+        self.snapshots.flush()
+        return results
+
+    def reprocess_snapshots(self) -> dict:
+        counts = {"snapshots": 0, "reconciled": 0}
+
+        for snapshots in latest_snapshots(PayloadSnapshot.TOSKANI_ORDER):
+            transactions = list(
+                Transaction.objects.filter(
+                    cod_id_omie__in=list(snapshots), received_value__isnull=True
+                ).select_related("account")
+            )
+            results = [
+                self._parse_order(snapshots[transaction.cod_id_omie])
+                for transaction in transactions
+            ]
+            # Only paid orders are applied; backoff state belongs to live checks
+            paid = [
+                (transaction, result)
+                for transaction, result in zip(transactions, results)
+                if result.get("order_status") == 2
+            ]
+            updates, _ = self._reconcile_chunk(
+                [transaction for transaction, _ in paid],
+                [result for _, result in paid],
+            )
+
+            counts["snapshots"] += len(snapshots)
+            counts["reconciled"] += len(updates)
+
+        if counts["reconciled"]:
+            invalidate_transaction_summary()
+
+        return counts
+
+    async def _consult_toskani_orders(
+        self, transactions: list[Transaction]
+    ) -> list[dict]:
+        semaphore = asyncio.Semaphore(settings.TOSKANI_CONCURRENCY)
+        limits = httpx.Limits(
+            max_connections=settings.TOSKANI_CONCURRENCY,
+            max_keepalive_connections=settings.TOSKANI_CONCURRENCY,
+        )
+        timeout = httpx.Timeout(
+            settings.TOSKANI_READ_TIMEOUT, connect=settings.TOSKANI_CONNECT_TIMEOUT
+        )
+
+        async with httpx.AsyncClient(
+            headers=self.headers, limits=limits, timeout=timeout
+        ) as client:
+            return await asyncio.gather(
+                *(
+                    self._consult_order(client, semaphore, transaction)
+                    for transaction in transactions
+                )
+            )
+
+    async def _consult_order(
+        self,
+        client: httpx.AsyncClient,
+        semaphore: asyncio.Semaphore,
+        transaction: Transaction,
+    ) -> dict:
         url = f"{self.base_url}&pedido={transaction.cod_id_omie}"
-        response = self._send_request(url)
-        if response and response.json():
-            response_data = response.json()
-
-            if response_data.get("status_pedido") == 2:
-                toskani_data = {
-                    "received_value": response_data.get("valor"),
-                    "payment_date": datetime.strptime(
-                        response_data.get("data_pagamento"), "%Y-%m-%d %H:%M:%S"
-                    ).date(),
-                }
-                return toskani_data
-
-        return {}
-
-    def _send_request(self, url: str):
-        try:
-            response = requests.get(url, headers=self.headers, timeout=(5, 15))
-            response.raise_for_status()
-            return response
-        except requests.RequestException as e:
-            print(f"Request failed: {e}")
-            return None
+
+        async with semaphore:
+            try:
+                response = await asyncio.wait_for(
+                    client.get(url), timeout=settings.TOSKANI_REQUEST_DEADLINE
+                )
+                response.raise_for_status()
+                response_data = response.json()
+            except (httpx.HTTPError, asyncio.TimeoutError, ValueError) as e:
+                logger.warning(
+                    "Toskani order %s failed: %s", transaction.cod_id_omie, repr(e)
+                )
+                return {}
+
+        self.snapshots.add(transaction.cod_id_omie, response_data)
+        return self._parse_order(response_data)
+
+    @staticmethod
+    def _parse_order(response_data) -> dict:
+        if not response_data or not isinstance(response_data, dict):
+            return {}
+
+        if response_data.get("status_pedido") != 2:
+            return {"order_status": response_data.get("status_pedido")}
+
+        return {
+            "order_status": 2,
+            "received_value": to_cents(response_data.get("valor")),
+            "payment_date": datetime.strptime(
+                response_data["data_pagamento"], "%Y-%m-%d %H:%M:%S"
+            ).date(),
+        }
@@ -1,26 +1,273 @@
+import base64
+import csv
+import hashlib
+import json
+import logging
+import time
+import uuid
+import zlib
+from datetime import date
+from http import HTTPStatus
+from typing import Iterator, Optional, Union
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection
+from django.db import transaction as transaction_django
+from django.db.models import Count, DateField, Q, QuerySet, Sum
+from django.db.models.functions import Trunc
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from ninja.errors import HttpError
+
+from apps.transactions.models import (
+    LATE_PAYMENT_STATUS,
+    UNPAID_NOT_LATE,
+    Transaction,
+)
+from apps.transactions.schema import TransactionFilterSchema
+from utils.money import to_reais
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_CACHE_VERSION_KEY = "transactions:summary:version"
+
 
-from apps.transactions.models import Transaction
+def invalidate_transaction_summary() -> None:
+    # Runs after the sync writes are committed, so a cache failure is only logged
+    try:
+        with transaction_django.atomic():
+            try:
+                cache.incr(SUMMARY_CACHE_VERSION_KEY)
+            except ValueError:
+                # A fresh version must not collide with summaries cached under an old one
+                cache.set(SUMMARY_CACHE_VERSION_KEY, time.time_ns(), timeout=None)
+    except DatabaseError:
+        logger.exception("Could not invalidate the transactions summary cache")
+
+
+class _Echo:
+    def write(self, value: str) -> str:
+        return value
 
 
 class TransactionService:
+    EXPORT_FIELDS = (
+        "id",
+        "cod_id_omie",
+        "account_id",
+        "tid",
+        "order_number",
+        "document_type",
+        "installment",
+        "expected_date",
+        "expected_value",
+        "fee",
+        "balance",
+        "payment_date",
+        "received_value",
+        "acquirer_fee",
+        "value_difference",
+        "status",
+        "omie_receipt_releasead",
+        "omie_fee_launched",
+        "omie_value_transferred",
+    )
+    MONEY_FIELDS = (
+        "expected_value",
+        "fee",
+        "balance",
+        "received_value",
+        "acquirer_fee",
+        "value_difference",
+    )
+
     def get_all_transactions(self):
         return Transaction.objects.select_related(
             "account__omie_account_origin", "account__omie_account_destiny"
         )
 
-    def list_transactions(self, **kwargs) -> dict:
-        transactions = self.get_all_transactions()
-        total = transactions.count()
-        data = {"total": total, "transactions": transactions}
+    def list_transactions(
+        self,
+        filters: TransactionFilterSchema,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        include_total: bool = False,
+    ) -> dict:
+        limit = max(1, min(limit, settings.TRANSACTIONS_PAGE_MAX_LIMIT))
+        transactions = filters.filter(self.get_all_transactions()).order_by(
+            "expected_date", "id"
+        )
+        total = self._estimate_total(transactions, filters) if include_total else None
+
+        if cursor:
+            expected_date, last_id = self._decode_cursor(cursor)
+            transactions = transactions.filter(
+                Q(expected_date__gt=expected_date)
+                | Q(expected_date=expected_date, id__gt=last_id)
+            )
+
+        page = list(transactions[: limit + 1])
+        next_cursor = (
+            self._encode_cursor(page[limit - 1]) if len(page) > limit else None
+        )
+
+        data = {
+            "total": total,
+            "next_cursor": next_cursor,
+            "transactions": page[:limit],
+        }
         return data
 
-    def check_late_bills(self) -> str:
-        transactions = Transaction.objects.filter(
-            received_value__isnull=True, expected_date__lt=timezone.now().date()
+    def export_transactions(
+        self,
+        filters: TransactionFilterSchema,
+        file_format: str = "csv",
+        compress: bool = False,
+    ) -> StreamingHttpResponse:
+        rows = (
+            filters.filter(Transaction.objects.all())
+            .order_by("expected_date", "id")
+            .values(*self.EXPORT_FIELDS)
+            .iterator(chunk_size=settings.TRANSACTIONS_EXPORT_CHUNK_SIZE)
+        )
+        rows = (self._money_to_reais(row, self.MONEY_FIELDS) for row in rows)
+
+        if file_format == "ndjson":
+            text = self._export_ndjson(rows)
+            content_type = "application/x-ndjson"
+        else:
+            text = self._export_csv(rows)
+            content_type = "text/csv"
+
+        filename = f"transactions.{file_format}"
+        content: Iterator[Union[str, bytes]] = text
+        if compress:
+            content = self._gzip(text)
+            content_type = "application/gzip"
+            filename += ".gz"
+
+        response = StreamingHttpResponse(
+            self._buffer(content), content_type=content_type
         )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    def _export_csv(self, rows: Iterator[dict]) -> Iterator[str]:
+        writer = csv.writer(_Echo())
+        yield writer.writerow(self.EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow([row[field] for field in self.EXPORT_FIELDS])
+
+    def _export_ndjson(self, rows: Iterator[dict]) -> Iterator[str]:
+        for row in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+    @staticmethod
+    def _money_to_reais(row: dict, fields) -> dict:
+        for field in fields:
+            if field in row:
+                row[field] = to_reais(row[field])
+        return row
+
+    @staticmethod
+    def _gzip(content: Iterator[str]) -> Iterator[bytes]:
+        compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+        for chunk in content:
+            if data := compressor.compress(chunk.encode()):
+                yield data
+        yield compressor.flush()
+
+    @staticmethod
+    def _buffer(content: Iterator) -> Iterator:
+        buffer = []
+        size = 0
+        for chunk in content:
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= settings.TRANSACTIONS_EXPORT_BUFFER_SIZE:
+                yield (b"" if isinstance(chunk, bytes) else "").join(buffer)
+                buffer = []
+                size = 0
+        if buffer:
+            yield (b"" if isinstance(buffer[0], bytes) else "").join(buffer)
+
+    def summarize_transactions(
+        self, filters: TransactionFilterSchema, bucket: str = "day"
+    ) -> dict:
+        version = cache.get_or_set(
+            SUMMARY_CACHE_VERSION_KEY, time.time_ns, timeout=None
+        )
+        params = json.dumps(
+            [bucket, filters.dict(exclude_none=True)], cls=DjangoJSONEncoder
+        )
+        key = (
+            f"transactions:summary:{version}:"
+            f"{hashlib.md5(params.encode()).hexdigest()}"
+        )
+
+        if (summary := cache.get(key)) is None:
+            rows = (
+                filters.filter(Transaction.objects.all())
+                .annotate(
+                    period=Trunc("expected_date", bucket, output_field=DateField())
+                )
+                .values("status", "account_id", "document_type", "period")
+                .annotate(
+                    count=Count("id"),
+                    total_expected_value=Sum("expected_value"),
+                    total_received_value=Sum("received_value"),
+                    total_fee=Sum("fee"),
+                    total_acquirer_fee=Sum("acquirer_fee"),
+                    total_value_difference=Sum("value_difference"),
+                )
+                .order_by("period", "account_id", "status", "document_type")
+            )
+            totals = [f"total_{field}" for field in self.MONEY_FIELDS]
+            summary = {
+                "bucket": bucket,
+                "rows": [self._money_to_reais(row, totals) for row in rows],
+            }
+            cache.set(key, summary, settings.TRANSACTIONS_SUMMARY_CACHE_TIMEOUT)
+
+        return summary
+
+    def _estimate_total(
+        self, transactions: QuerySet, filters: TransactionFilterSchema
+    ) -> int:
+        if connection.vendor == "postgresql" and not filters.dict(exclude_none=True):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                    [Transaction._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return row[0]
+
+        return transactions.count()
+
+    @staticmethod
+    def _encode_cursor(transaction: Transaction) -> str:
+        value = f"{transaction.expected_date.isoformat()}|{transaction.id}"
+        return base64.urlsafe_b64encode(value.encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple[date, uuid.UUID]:
+        try:
+            value = base64.urlsafe_b64decode(cursor.encode()).decode()
+            expected_date, last_id = value.split("|")
+            return date.fromisoformat(expected_date), uuid.UUID(last_id)
+        except ValueError as exception:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Cursor inválido") from exception
+
+    def check_late_bills(self) -> dict:
+        late = Transaction.objects.filter(
+            UNPAID_NOT_LATE, expected_date__lt=timezone.now().date()
+        ).update(status=LATE_PAYMENT_STATUS)
 
-        if transactions:
-            transactions.update(status="Pagamento em atraso")
+        if late:
+            invalidate_transaction_summary()
 
-        return "Success"
+        return {"late": late}
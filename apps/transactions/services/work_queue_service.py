@@ -0,0 +1,194 @@
+import logging
+from datetime import timedelta
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import transaction as transaction_django
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.transactions.models import Transaction, TransactionWorkItem
+from apps.transactions.services.writeback_service import get_writeback_executor
+
+logger = logging.getLogger(__name__)
+
+ACTION_FLAGS = {
+    TransactionWorkItem.RECEIPT: "omie_receipt_releasead",
+    TransactionWorkItem.FEE: "omie_fee_launched",
+    TransactionWorkItem.TRANSFER: "omie_value_transferred",
+}
+
+
+class WorkQueueService:
+    def __init__(self, omie_service):
+        self.writeback = get_writeback_executor()
+        self.actions = {
+            TransactionWorkItem.RECEIPT: omie_service.release_omie_receipt,
+            TransactionWorkItem.FEE: omie_service.launch_omie_fee,
+            TransactionWorkItem.TRANSFER: omie_service.transfer_omie_value,
+        }
+
+    @staticmethod
+    def enqueue(transactions: Iterable[Transaction], actions: list[str]) -> None:
+        TransactionWorkItem.objects.bulk_create(
+            [
+                TransactionWorkItem(transaction=transaction, action=action)
+                for transaction in transactions
+                for action in actions
+            ],
+            ignore_conflicts=True,
+        )
+
+    @staticmethod
+    def enqueue_reconciled(transactions: Iterable[Transaction]) -> None:
+        items = []
+
+        for transaction in transactions:
+            if (
+                not transaction.account.settle
+                and not transaction.omie_receipt_releasead
+            ):
+                items.append((transaction, TransactionWorkItem.RECEIPT))
+            if not transaction.omie_fee_launched:
+                items.append((transaction, TransactionWorkItem.FEE))
+            if (
+                transaction.account.omie_account_destiny_id
+                and not transaction.omie_value_transferred
+            ):
+                items.append((transaction, TransactionWorkItem.TRANSFER))
+
+        TransactionWorkItem.objects.bulk_create(
+            [
+                TransactionWorkItem(transaction=transaction, action=action)
+                for transaction, action in items
+            ],
+            ignore_conflicts=True,
+        )
+
+    @staticmethod
+    def complete(transaction_ids: Iterable, action: str) -> None:
+        TransactionWorkItem.objects.filter(
+            transaction_id__in=transaction_ids, action=action
+        ).delete()
+
+    def process_due(self, batch_size: Optional[int] = None) -> int:
+        batch_size = batch_size or settings.OMIE_WRITEBACK_BATCH_SIZE
+        processed = 0
+
+        while claimed := self._claim(batch_size):
+            items = self._drop_stale(claimed)
+            results = self.writeback.map(self._run, items)
+            self._settle(items, results)
+            processed += len(claimed)
+
+        return processed
+
+    def _claim(self, batch_size: int) -> list[TransactionWorkItem]:
+        now = timezone.now()
+
+        with transaction_django.atomic():
+            items = list(
+                TransactionWorkItem.objects.select_for_update(
+                    skip_locked=True, of=("self",)
+                )
+                .select_related(
+                    "transaction__account__omie_account_origin",
+                    "transaction__account__omie_account_destiny",
+                )
+                .filter(due_at__lte=now, failed_at__isnull=True)
+                .filter(Q(claimed_until__isnull=True) | Q(claimed_until__lt=now))
+                .order_by("due_at")[:batch_size]
+            )
+            TransactionWorkItem.objects.filter(
+                id__in=[item.id for item in items]
+            ).update(
+                claimed_until=now + timedelta(seconds=settings.WORK_QUEUE_LEASE_SECONDS)
+            )
+
+        return items
+
+    @staticmethod
+    def _drop_stale(items: list[TransactionWorkItem]) -> list[TransactionWorkItem]:
+        stale = [
+            item
+            for item in items
+            if item.action == TransactionWorkItem.TRANSFER
+            and not item.transaction.account.omie_account_destiny_id
+        ]
+
+        if not stale:
+            return items
+
+        TransactionWorkItem.objects.filter(id__in=[item.id for item in stale]).delete()
+        logger.warning(
+            "Dropped %s Omie transfers whose account has no destination", len(stale)
+        )
+        return [item for item in items if item not in stale]
+
+    def _run(self, item: TransactionWorkItem) -> bool:
+        try:
+            return bool(
+                self.writeback.call(self.actions[item.action], item.transaction)
+            )
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception("Omie %s failed for work item %s", item.action, item.id)
+            return False
+
+    def _settle(self, items: list[TransactionWorkItem], results: list[bool]) -> None:
+        now = timezone.now()
+        done: dict[str, list] = {}
+        failed = []
+        dead = 0
+
+        for item, ok in zip(items, results):
+            if ok:
+                done.setdefault(item.action, []).append(item)
+                continue
+
+            item.attempts += 1
+            item.claimed_until = None
+            failed.append(item)
+
+            if item.attempts >= settings.WORK_QUEUE_MAX_ATTEMPTS:
+                item.failed_at = now
+                dead += 1
+                logger.warning(
+                    "Omie %s for transaction %s gave up after %s attempts",
+                    item.action,
+                    item.transaction_id,
+                    item.attempts,
+                )
+                continue
+
+            item.due_at = now + timedelta(
+                seconds=min(
+                    settings.WORK_QUEUE_RETRY_MAX,
+                    settings.WORK_QUEUE_RETRY_BASE * 2 ** (item.attempts - 1),
+                )
+            )
+
+        with transaction_django.atomic():
+            for action, action_items in done.items():
+                Transaction.objects.filter(
+                    id__in=[item.transaction_id for item in action_items]
+                ).update(**{ACTION_FLAGS[action]: True})
+                TransactionWorkItem.objects.filter(
+                    id__in=[item.id for item in action_items]
+                ).delete()
+
+            TransactionWorkItem.objects.bulk_update(
+                failed, ["attempts", "claimed_until", "due_at", "failed_at"]
+            )
+
+        logger.info(
+            "Omie work queue: %s done, %s rescheduled, %s failed",
+            len(items) - len(failed),
+            len(failed) - dead,
+            dead,
+        )
+
+    @staticmethod
+    def retry_failed() -> int:
+        return TransactionWorkItem.objects.filter(failed_at__isnull=False).update(
+            failed_at=None, attempts=0, due_at=timezone.now()
+        )
@@ -0,0 +1,114 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional
+
+from django.conf import settings
+
+from utils.omie_client import OmieResult
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.max_rate = rate
+        self.min_rate = rate / 16
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+    def slow_down(self) -> None:
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+
+    def speed_up(self) -> None:
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+class OmieWritebackExecutor:
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        max_retries: Optional[int] = None,
+    ):
+        self.max_workers = max_workers or settings.OMIE_WRITEBACK_WORKERS
+        self.max_retries = (
+            settings.OMIE_WRITEBACK_MAX_RETRIES if max_retries is None else max_retries
+        )
+        self.bucket = TokenBucket(
+            rate or settings.OMIE_RATE_LIMIT, burst or settings.OMIE_RATE_BURST
+        )
+
+    def call(self, action: Callable[..., OmieResult], *args) -> OmieResult:
+        attempt = 0
+
+        while True:
+            self.bucket.acquire()
+            result = action(*args)
+
+            if not result.throttled:
+                self.bucket.speed_up()
+                return result
+
+            self.bucket.slow_down()
+
+            if attempt >= self.max_retries:
+                return result
+
+            delay = min(
+                settings.OMIE_BACKOFF_MAX, settings.OMIE_BACKOFF_BASE * 2**attempt
+            )
+            delay += random.uniform(0, delay / 2)
+            logger.info(
+                "Omie %s throttled (%s), retrying in %.1fs",
+                action.__name__,
+                result.status_code,
+                delay,
+            )
+            time.sleep(delay)
+            attempt += 1
+
+    def map(self, func: Callable, items: Iterable) -> list:
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(func, items))
+
+
+_executor: Optional[OmieWritebackExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_writeback_executor() -> OmieWritebackExecutor:
+    global _executor  # pylint: disable=global-statement
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = OmieWritebackExecutor()
+
+    return _executor
@@ -0,0 +1,18 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from apps.transactions.models import Transaction
+
+
+@skipUnless(connection.vendor == "postgresql", "EXPLAIN output is PostgreSQL specific")
+class PendingSyncIndexTest(TestCase):
+    def test_pending_sync_uses_partial_index(self):
+        # The test table is empty, so a sequential scan would always be cheaper
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+        plan = Transaction.objects.pending_sync().explain()
+
+        self.assertIn("transaction_pending_sync_idx", plan)
@@ -95,6 +95,16 @@ DATABASES = {
 
 DATABASES["default"] = dj_database_url.parse(str(os.getenv("POSTGRES_URL")))
 
+# Shared by the web, worker and management command processes so that cache
+# invalidation done by one of them is seen by all (table created by a migration)
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "django_cache",
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -149,3 +159,79 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
     "https://conciliadora-cc.vercel.app",
 ]
+
+# Omie integration
+
+OMIE_POOL_SIZE = int(os.getenv("OMIE_POOL_SIZE", "10"))
+OMIE_CONNECT_TIMEOUT = float(os.getenv("OMIE_CONNECT_TIMEOUT", "5"))
+OMIE_READ_TIMEOUT = float(os.getenv("OMIE_READ_TIMEOUT", "15"))
+
+# Toskani integration
+
+TOSKANI_CONCURRENCY = int(os.getenv("TOSKANI_CONCURRENCY", "20"))
+TOSKANI_CONNECT_TIMEOUT = float(os.getenv("TOSKANI_CONNECT_TIMEOUT", "5"))
+TOSKANI_READ_TIMEOUT = float(os.getenv("TOSKANI_READ_TIMEOUT", "15"))
+TOSKANI_REQUEST_DEADLINE = float(os.getenv("TOSKANI_REQUEST_DEADLINE", "20"))
+TOSKANI_CHUNK_SIZE = int(os.getenv("TOSKANI_CHUNK_SIZE", "200"))
+
+# Unpaid orders are re-checked after BASE * 2^attempts seconds, capped at MAX
+TOSKANI_CHECK_BACKOFF_BASE = int(os.getenv("TOSKANI_CHECK_BACKOFF_BASE", "3600"))
+TOSKANI_CHECK_BACKOFF_MAX = int(os.getenv("TOSKANI_CHECK_BACKOFF_MAX", "172800"))
+
+# Background sync jobs: running jobs without a heartbeat for STALE seconds are failed
+
+SYNC_JOB_HEARTBEAT_SECONDS = int(os.getenv("SYNC_JOB_HEARTBEAT_SECONDS", "30"))
+SYNC_JOB_STALE_SECONDS = int(os.getenv("SYNC_JOB_STALE_SECONDS", "300"))
+
+# Omie write-back quota: requests per second shared by all write-back workers
+
+OMIE_RATE_LIMIT = float(os.getenv("OMIE_RATE_LIMIT", "3"))
+OMIE_RATE_BURST = float(os.getenv("OMIE_RATE_BURST", "3"))
+OMIE_WRITEBACK_WORKERS = int(os.getenv("OMIE_WRITEBACK_WORKERS", "4"))
+OMIE_WRITEBACK_MAX_RETRIES = int(os.getenv("OMIE_WRITEBACK_MAX_RETRIES", "4"))
+OMIE_BACKOFF_BASE = float(os.getenv("OMIE_BACKOFF_BASE", "1"))
+OMIE_BACKOFF_MAX = float(os.getenv("OMIE_BACKOFF_MAX", "30"))
+OMIE_WRITEBACK_BATCH_SIZE = int(os.getenv("OMIE_WRITEBACK_BATCH_SIZE", "100"))
+
+# Omie receivables ingestion: how far back a run may reach and how many days
+# each committed range covers
+
+OMIE_BACKFILL_DAYS = int(os.getenv("OMIE_BACKFILL_DAYS", "30"))
+OMIE_SYNC_RANGE_DAYS = int(os.getenv("OMIE_SYNC_RANGE_DAYS", "1"))
+OMIE_LIST_PAGE_SIZE = int(os.getenv("OMIE_LIST_PAGE_SIZE", "500"))
+OMIE_PAGE_WORKERS = int(os.getenv("OMIE_PAGE_WORKERS", "4"))
+OMIE_LIST_ONLY_INGESTION = os.getenv("OMIE_LIST_ONLY_INGESTION", "True").lower() in (
+    "true",
+    "1",
+)
+
+# Installment fees are cached per process; signals invalidate the local copy and
+# the TTL bounds how stale other processes can be
+
+INSTALLMENT_FEE_CACHE_TTL = int(os.getenv("INSTALLMENT_FEE_CACHE_TTL", "300"))
+
+# Transactions listing
+
+TRANSACTIONS_PAGE_MAX_LIMIT = int(os.getenv("TRANSACTIONS_PAGE_MAX_LIMIT", "500"))
+TRANSACTIONS_EXPORT_CHUNK_SIZE = int(
+    os.getenv("TRANSACTIONS_EXPORT_CHUNK_SIZE", "2000")
+)
+TRANSACTIONS_EXPORT_BUFFER_SIZE = 64 * 1024
+TRANSACTIONS_SUMMARY_CACHE_TIMEOUT = int(
+    os.getenv("TRANSACTIONS_SUMMARY_CACHE_TIMEOUT", "300")
+)
+
+# Omie write-back work queue
+
+WORK_QUEUE_LEASE_SECONDS = int(os.getenv("WORK_QUEUE_LEASE_SECONDS", "600"))
+WORK_QUEUE_RETRY_BASE = int(os.getenv("WORK_QUEUE_RETRY_BASE", "300"))
+WORK_QUEUE_RETRY_MAX = int(os.getenv("WORK_QUEUE_RETRY_MAX", "86400"))
+WORK_QUEUE_MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "8"))
+
+# Raw Omie/Toskani responses kept for offline reprocessing
+
+PAYLOAD_SNAPSHOTS_ENABLED = os.getenv("PAYLOAD_SNAPSHOTS_ENABLED", "True").lower() in (
+    "true",
+    "1",
+)
+PAYLOAD_SNAPSHOT_BATCH_SIZE = int(os.getenv("PAYLOAD_SNAPSHOT_BATCH_SIZE", "500"))
@@ -0,0 +1,28 @@
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Optional, Union
+
+Cents = int
+
+CENT = Decimal("0.01")
+
+
+def to_cents(value: Union[float, str, Decimal, None]) -> Optional[Cents]:
+    if value is None:
+        return None
+
+    return int(Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+
+
+def to_reais(cents: Optional[Cents]) -> Optional[float]:
+    if cents is None:
+        return None
+
+    return float(Decimal(cents) * CENT)
+
+
+def percent_of(cents: Cents, percent: Decimal) -> Cents:
+    return int(
+        (Decimal(cents) * Decimal(str(percent)) / 100).quantize(
+            Decimal(1), rounding=ROUND_HALF_UP
+        )
+    )
@@ -0,0 +1,129 @@
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# 502 and 504 are left out: the gateway may time out after Omie has applied the
+# call, and retrying a write such as LancarRecebimento would post it twice
+THROTTLED_STATUS_CODES = (429, 503)
+# Omie answers quota violations with a 500 fault rather than a 429
+THROTTLED_FAULTS = ("consumo redundante", "consumo indevido", "api bloqueada")
+
+
+@dataclass
+class OmieResult:
+    ok: bool
+    status_code: Optional[int] = None
+    data: Any = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    def __bool__(self) -> bool:
+        return self.ok
+
+    @property
+    def throttled(self) -> bool:
+        if self.status_code in THROTTLED_STATUS_CODES:
+            return True
+
+        fault = str(self.error or "").lower()
+        return any(marker in fault for marker in THROTTLED_FAULTS)
+
+    @property
+    def no_records(self) -> bool:
+        # Omie answers an empty listing page with a fault instead of an empty list
+        return (
+            not self.ok
+            and isinstance(self.data, dict)
+            and "Não existem registros" in str(self.data.get("faultstring", ""))
+        )
+
+
+class OmieClient:
+    base_url = "https://app.omie.com.br/api/v1"
+
+    def __init__(
+        self, pool_size: Optional[int] = None, timeout: Optional[tuple] = None
+    ):
+        pool_size = pool_size or settings.OMIE_POOL_SIZE
+        self.timeout = timeout or (
+            settings.OMIE_CONNECT_TIMEOUT,
+            settings.OMIE_READ_TIMEOUT,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True
+        )
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+        self.session.mount("https://", adapter)
+
+    def post(self, path: str, payload: dict) -> OmieResult:
+        url = f"{self.base_url}/{path.strip('/')}/"
+        call = payload.get("call")
+        start = time.perf_counter()
+
+        try:
+            response = self.session.post(
+                url, data=json.dumps(payload), timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            elapsed = time.perf_counter() - start
+            logger.warning("Omie %s %s failed after %.3fs: %s", path, call, elapsed, e)
+            return OmieResult(ok=False, error=str(e), elapsed=elapsed)
+
+        elapsed = time.perf_counter() - start
+
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+
+        if response.status_code != 200:
+            error = (
+                data.get("faultstring")
+                if isinstance(data, dict) and data.get("faultstring")
+                else response.reason
+            )
+            logger.warning(
+                "Omie %s %s returned %s after %.3fs: %s",
+                path,
+                call,
+                response.status_code,
+                elapsed,
+                error,
+            )
+            return OmieResult(
+                ok=False,
+                status_code=response.status_code,
+                data=data,
+                error=error,
+                elapsed=elapsed,
+            )
+
+        logger.debug("Omie %s %s took %.3fs", path, call, elapsed)
+        return OmieResult(
+            ok=True, status_code=response.status_code, data=data, elapsed=elapsed
+        )
+
+
+_client: Optional[OmieClient] = None
+_client_lock = threading.Lock()
+
+
+def get_omie_client() -> OmieClient:
+    global _client  # pylint: disable=global-statement
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OmieClient()
+
+    return _client